@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Adaptive poll interval for the Webex ISS bot
+Polls tightly right after a command, backs off exponentially while a
+room is idle, never polls faster than the API's rate-limit headers
+allow, and reports its current interval and call rate.
+"""
+
+import time
+from collections import deque
+
+
+class AdaptivePoller:
+    """Interval controller for one polled room"""
+
+    def __init__(self, min_interval=1.0, max_interval=120.0, backoff=2.0, idle_grace=60.0, share=1,
+                 clock=time.monotonic):
+        """
+        Args:
+            min_interval: Interval right after activity (seconds)
+            max_interval: Ceiling reached after a long idle period
+            backoff: Factor applied per idle poll once the grace period is over
+            idle_grace: Seconds to stay at min_interval after the last activity
+            share: Pollers drawing on the same host's rate-limit budget; the
+                   remaining calls are split evenly between them
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.idle_grace = idle_grace
+        self.share = max(1, share)
+        self.clock = clock
+        self.interval = min_interval
+        self.total_calls = 0
+        self._last_activity = clock()
+        self._rate_floor = 0.0
+        self._retry_until = 0.0
+        self._calls = deque()
+
+    def wake(self):
+        """A command was seen: drop straight back to the tight interval"""
+        self._last_activity = self.clock()
+        self.interval = self.min_interval
+
+    def after_poll(self, saw_messages=False):
+        """
+        Record one poll and compute the next interval
+
+        Args:
+            saw_messages: True if the poll returned any new message; that
+                          holds the interval but, unlike wake(), does not
+                          reset it (the bot's own replies count as messages)
+        """
+        now = self.clock()
+        self.total_calls += 1
+        self._calls.append(now)
+        self._prune(now)
+
+        if saw_messages:
+            self._last_activity = max(self._last_activity, now - self.idle_grace / 2)
+        elif now - self._last_activity >= self.idle_grace:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+    def observe_rate_limit(self, info):
+        """
+        Respect rate-limit information from the last response
+
+        Args:
+            info: Dict with optional "retry_after" (seconds), "remaining"
+                  (calls left) and "reset" (seconds until the window resets),
+                  as collected by http_client.ApiClient
+        """
+        if not info:
+            return
+        if info.get("retry_after") is not None:
+            self._retry_until = max(self._retry_until, info["at"] + info["retry_after"])
+        if info.get("remaining") is not None and info.get("reset") is not None:
+            # The remaining calls are for the whole host, not just this room
+            self._rate_floor = info["reset"] * self.share / max(1, info["remaining"])
+        else:
+            self._rate_floor = 0.0
+
+    def next_delay(self):
+        """Seconds to wait before the next poll"""
+        delay = max(self.interval, self._rate_floor)
+        return max(delay, self._retry_until - self.clock())
+
+    def calls_per_hour(self):
+        """Polls made in the last hour"""
+        self._prune(self.clock())
+        return len(self._calls)
+
+    def stats(self):
+        return {
+            "interval": round(self.next_delay(), 3),
+            "calls_last_hour": self.calls_per_hour(),
+            "total_calls": self.total_calls,
+        }
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0] > 3600:
+            self._calls.popleft()
@@ -4,11 +4,33 @@ All Three API Servers - REST, SOAP, and JSON-RPC
 Demonstrates three different API architectural styles
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
+import asyncio
 import threading
 import json
 from werkzeug.serving import make_server
 
+from api_codecs import JSON_CODEC, CodecError, codec_for_accept, codec_for_content_type
+
+# ============================================================
+# WIRE FORMAT HELPERS
+# ============================================================
+def request_codec():
+    """Codec matching the Content-Type of the current request"""
+    return codec_for_content_type(request.content_type)
+
+def read_body(codec):
+    """Decode the current request body with the given codec"""
+    return codec.decode(request.get_data(cache=False))
+
+def respond(payload, status=200, codec=None):
+    """Encode payload in the format the client Accepts (default: the request's format)"""
+    codec = codec_for_accept(request.headers.get('Accept'), codec)
+    # The codec may fall back to another format (msgpack -> JSON for
+    # big integers), so label the body with the codec that produced it
+    codec, body = codec.encode_as(payload)
+    return Response(body, status=status, mimetype=codec.mimetype)
+
 # ============================================================
 # REST API SERVER (Port 5000)
 # ============================================================
@@ -16,7 +38,7 @@ rest_app = Flask('REST_API')
 
 @rest_app.route('/')
 def rest_home():
-    return jsonify({
+    return respond({
         "message": "REST API Server",
         "endpoints": [
             {"method": "POST", "path": "/add", "description": "Add two numbers"},
@@ -26,19 +48,27 @@ def rest_home():
 
 @rest_app.route('/add', methods=['POST'])
 def rest_add():
-    data = request.get_json()
-    if 'a' not in data or 'b' not in data:
-        return jsonify({"error": "Missing parameters 'a' or 'b'"}), 400
+    codec = request_codec()
+    try:
+        data = read_body(codec)
+    except CodecError as e:
+        return respond({"error": str(e)}, 400, codec)
+    if not isinstance(data, dict) or 'a' not in data or 'b' not in data:
+        return respond({"error": "Missing parameters 'a' or 'b'"}, 400, codec)
     result = data['a'] + data['b']
-    return jsonify({"result": result})
+    return respond({"result": result}, codec=codec)
 
 @rest_app.route('/multiply', methods=['POST'])
 def rest_multiply():
-    data = request.get_json()
-    if 'a' not in data or 'b' not in data:
-        return jsonify({"error": "Missing parameters 'a' or 'b'"}), 400
+    codec = request_codec()
+    try:
+        data = read_body(codec)
+    except CodecError as e:
+        return respond({"error": str(e)}, 400, codec)
+    if not isinstance(data, dict) or 'a' not in data or 'b' not in data:
+        return respond({"error": "Missing parameters 'a' or 'b'"}, 400, codec)
     result = data['a'] * data['b']
-    return jsonify({"result": result})
+    return respond({"result": result}, codec=codec)
 
 # ============================================================
 # SOAP API SERVER (Port 5001)
@@ -220,6 +250,50 @@ def soap_endpoint():
 # ============================================================
 jsonrpc_app = Flask('JSONRPC_API')
 
+# Method table shared by the HTTP endpoint and the persistent stream transport
+JSONRPC_METHODS = {
+    'add': lambda a, b: a + b,
+    'multiply': lambda a, b: a * b,
+}
+
+def dispatch_jsonrpc(data):
+    """
+    Execute one decoded JSON-RPC 2.0 request against JSONRPC_METHODS
+
+    Args:
+        data: Decoded request object
+
+    Returns:
+        Tuple of (response object, HTTP status code)
+    """
+    if 'jsonrpc' not in data or data['jsonrpc'] != '2.0':
+        return {
+            "jsonrpc": "2.0",
+            "error": {"code": -32600, "message": "Invalid Request - jsonrpc version must be 2.0"},
+            "id": data.get('id', None)
+        }, 400
+    
+    method = data.get('method')
+    params = data.get('params', [])
+    request_id = data.get('id', None)
+    
+    handler = JSONRPC_METHODS.get(method) if isinstance(method, str) else None
+    if handler is None:
+        return {
+            "jsonrpc": "2.0",
+            "error": {"code": -32601, "message": f"Method not found: {method}"},
+            "id": request_id
+        }, 404
+    
+    if len(params) < 2:
+        return {
+            "jsonrpc": "2.0",
+            "error": {"code": -32602, "message": "Invalid params - need two numbers"},
+            "id": request_id
+        }, 400
+    result = handler(params[0], params[1])
+    return {"jsonrpc": "2.0", "result": result, "id": request_id}, 200
+
 @jsonrpc_app.route('/', methods=['GET', 'POST'])
 def jsonrpc_endpoint():
     if request.method == 'GET':
@@ -256,53 +330,142 @@ def jsonrpc_endpoint():
         ''', 200, {'Content-Type': 'text/html'}
     
     if request.method == 'POST':
+        codec = request_codec()
         try:
-            data = request.get_json()
-            
-            if 'jsonrpc' not in data or data['jsonrpc'] != '2.0':
-                return jsonify({
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32600, "message": "Invalid Request - jsonrpc version must be 2.0"},
-                    "id": data.get('id', None)
-                }), 400
-            
-            method = data.get('method')
-            params = data.get('params', [])
-            request_id = data.get('id', None)
-            
-            if method == 'add':
-                if len(params) < 2:
-                    return jsonify({
-                        "jsonrpc": "2.0",
-                        "error": {"code": -32602, "message": "Invalid params - need two numbers"},
-                        "id": request_id
-                    }), 400
-                result = params[0] + params[1]
-                return jsonify({"jsonrpc": "2.0", "result": result, "id": request_id})
-            
-            elif method == 'multiply':
-                if len(params) < 2:
-                    return jsonify({
-                        "jsonrpc": "2.0",
-                        "error": {"code": -32602, "message": "Invalid params - need two numbers"},
-                        "id": request_id
-                    }), 400
-                result = params[0] * params[1]
-                return jsonify({"jsonrpc": "2.0", "result": result, "id": request_id})
-            
-            else:
-                return jsonify({
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32601, "message": f"Method not found: {method}"},
-                    "id": request_id
-                }), 404
+            data = read_body(codec)
+            payload, status = dispatch_jsonrpc(data)
+            return respond(payload, status, codec)
                 
         except Exception as e:
-            return jsonify({
+            return respond({
                 "jsonrpc": "2.0",
                 "error": {"code": -32700, "message": f"Parse error: {str(e)}"},
                 "id": None
-            }), 400
+            }, 400, codec)
+
+# ============================================================
+# JSON-RPC STREAM SERVER (Port 5003)
+# Newline-delimited JSON-RPC 2.0 over one persistent TCP connection.
+# Calls are multiplexed by "id" and may complete out of order.
+# ============================================================
+STREAM_MAX_LINE = 1024 * 1024
+STREAM_MAX_IN_FLIGHT = 256
+
+def dispatch_jsonrpc_stream(data):
+    """
+    Execute a decoded stream message (single request or batch)
+
+    Args:
+        data: Decoded request object or list of request objects
+
+    Returns:
+        Response object/list, or None when nothing should be sent back
+        (notifications without an "id")
+    """
+    if isinstance(data, list):
+        replies = [r for r in map(dispatch_jsonrpc_stream, data) if r is not None]
+        return replies or None
+    if not isinstance(data, dict):
+        return {
+            "jsonrpc": "2.0",
+            "error": {"code": -32600, "message": "Invalid Request - expected an object"},
+            "id": None
+        }
+    try:
+        payload, _ = dispatch_jsonrpc(data)
+    except Exception as e:
+        payload = {
+            "jsonrpc": "2.0",
+            "error": {"code": -32603, "message": f"Internal error: {str(e)}"},
+            "id": data.get('id', None)
+        }
+    if 'id' not in data:
+        return None
+    return payload
+
+async def handle_jsonrpc_stream(reader, writer, max_in_flight=STREAM_MAX_IN_FLIGHT):
+    """
+    Serve one persistent connection
+
+    Each line is dispatched as its own task. At most max_in_flight calls
+    may be executing or waiting to be written; once that many are
+    outstanding we stop reading, so a client that floods requests without
+    reading replies is throttled by TCP backpressure.
+    """
+    slots = asyncio.Semaphore(max_in_flight)
+    outbox = asyncio.Queue()
+    tasks = set()
+
+    async def flush():
+        while True:
+            line = await outbox.get()
+            if line is None:
+                break
+            writer.write(line)
+            slots.release()
+            if outbox.empty():
+                await writer.drain()
+
+    async def run_call(data):
+        # The slot is handed to flush() with the queued reply; every other
+        # outcome (notification, failure) must give it back here
+        queued = False
+        try:
+            try:
+                payload = dispatch_jsonrpc_stream(data)
+                line = None if payload is None else JSON_CODEC.encode(payload) + b'\n'
+            except Exception as e:
+                if isinstance(data, dict) and 'id' not in data:
+                    line = None
+                else:
+                    line = JSON_CODEC.encode({
+                        "jsonrpc": "2.0",
+                        "error": {"code": -32603, "message": f"Internal error: {str(e)}"},
+                        "id": data.get('id', None) if isinstance(data, dict) else None
+                    }) + b'\n'
+            if line is not None:
+                await outbox.put(line)
+                queued = True
+        finally:
+            if not queued:
+                slots.release()
+
+    flusher = asyncio.create_task(flush())
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                line = await reader.readline()
+            except (asyncio.LimitOverrunError, ValueError):
+                line = b''
+            if not line:
+                slots.release()
+                break
+            if not line.strip():
+                slots.release()
+                continue
+            try:
+                data = JSON_CODEC.decode(line)
+            except CodecError as e:
+                await outbox.put(JSON_CODEC.encode({
+                    "jsonrpc": "2.0",
+                    "error": {"code": -32700, "message": f"Parse error: {str(e)}"},
+                    "id": None
+                }) + b'\n')
+                continue
+            task = asyncio.create_task(run_call(data))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await outbox.put(None)
+        await flusher
+    except ConnectionError:
+        pass
+    finally:
+        flusher.cancel()
+        writer.close()
 
 # ============================================================
 # SERVER MANAGEMENT
@@ -320,6 +483,22 @@ class ServerThread(threading.Thread):
     def shutdown(self):
         self.server.shutdown()
 
+class StreamServerThread(threading.Thread):
+    def __init__(self, port, host='localhost'):
+        threading.Thread.__init__(self)
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(handle_jsonrpc_stream, host, port, limit=STREAM_MAX_LINE)
+        )
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
 def main():
     print("=" * 60)
     print("Starting All Three API Servers...")
@@ -328,6 +507,7 @@ def main():
     print("1. REST API:     http://localhost:5000")
     print("2. SOAP API:     http://localhost:5001")
     print("3. JSON-RPC API: http://localhost:5002")
+    print("   JSON-RPC stream (NDJSON over TCP): localhost:5003")
     print()
     print("Press Ctrl+C to stop all servers")
     print()
@@ -337,14 +517,17 @@ def main():
     rest_server = ServerThread(rest_app, 5000)
     soap_server = ServerThread(soap_app, 5001)
     jsonrpc_server = ServerThread(jsonrpc_app, 5002)
+    jsonrpc_stream_server = StreamServerThread(5003)
     
     rest_server.daemon = True
     soap_server.daemon = True
     jsonrpc_server.daemon = True
+    jsonrpc_stream_server.daemon = True
     
     rest_server.start()
     soap_server.start()
     jsonrpc_server.start()
+    jsonrpc_stream_server.start()
     
     try:
         # Keep main thread alive
@@ -355,6 +538,7 @@ def main():
         rest_server.shutdown()
         soap_server.shutdown()
         jsonrpc_server.shutdown()
+        jsonrpc_stream_server.shutdown()
         print("All servers stopped.")
 
 if __name__ == '__main__':
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Wire codecs for the REST and JSON-RPC servers
+Picks the fastest available JSON backend and adds MessagePack,
+selected per request by Content-Type / Accept negotiation
+"""
+
+import json
+import math
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+
+class CodecError(ValueError):
+    """Raised when a request body cannot be decoded"""
+
+
+# ============================================================
+# JSON BACKENDS
+# ============================================================
+def _stdlib_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _stdlib_loads(data):
+    return json.loads(data)
+
+
+# 19+ digits in a row may be an integer wider than 64 bits, which orjson
+# turns into a float (or rejects) where json keeps an exact int. Such
+# bodies are rare, so they simply take the stdlib parser; a match inside
+# a string or fraction only costs speed, never correctness. Mapping every
+# digit to '0' and searching for a run is two C-speed passes, where a
+# regex would backtrack on every number.
+_DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+_LONG_DIGITS = b'0' * 19
+
+
+def _exact_ints(loads):
+    def exact_loads(data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if _LONG_DIGITS in data.translate(_DIGITS_TO_ZERO):
+            return _stdlib_loads(data)
+        return loads(data)
+    return exact_loads
+
+
+# json writes NaN and +/-Infinity, where orjson silently writes null
+# (ujson raises). A non-finite float can only hide behind a null in the
+# output, so only those replies pay for walking the object; finding one
+# raises OverflowError, which sends the reply through the stdlib codec.
+def _has_non_finite(obj):
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(value) for value in obj)
+    return False
+
+
+def _finite_floats(dumps):
+    def finite_dumps(obj):
+        data = dumps(obj)
+        if b'null' in data and _has_non_finite(obj):
+            raise OverflowError("Non-finite float")
+        return data
+    return finite_dumps
+
+
+if orjson is not None:
+    JSON_BACKEND = 'orjson'
+    _json_dumps = _finite_floats(orjson.dumps)
+    _json_loads = _exact_ints(orjson.loads)
+elif ujson is not None:
+    JSON_BACKEND = 'ujson'
+    _json_dumps = _finite_floats(lambda obj: ujson.dumps(obj, ensure_ascii=False).encode('utf-8'))
+    _json_loads = _exact_ints(ujson.loads)
+else:
+    JSON_BACKEND = 'json'
+    _json_dumps = _stdlib_dumps
+    _json_loads = _stdlib_loads
+
+
+class Codec:
+    """A named wire format: a mimetype plus encode/decode functions"""
+
+    def __init__(self, name, mimetype, dumps, loads, fallback=None):
+        """
+        Args:
+            name: Backend name
+            mimetype: Media type of the encoded bytes
+            dumps: Callable object -> bytes
+            loads: Callable bytes -> object
+            fallback: Codec used for values this backend cannot represent
+                      (integers wider than 64 bits, NaN/Infinity); it may use a
+                      different media type, see encode_as()
+        """
+        self.name = name
+        self.mimetype = mimetype
+        self._dumps = dumps
+        self._loads = loads
+        self.fallback = fallback
+
+    def encode_as(self, obj):
+        """
+        Serialize a Python object, falling back when the backend cannot
+
+        Args:
+            obj: JSON-compatible object (dict, list, str, int, float, bool, None)
+
+        Returns:
+            Tuple of (codec that produced the bytes, encoded bytes)
+        """
+        try:
+            return self, self._dumps(obj)
+        except (TypeError, OverflowError):
+            if self.fallback is None:
+                raise
+            return self.fallback.encode_as(obj)
+
+    def encode(self, obj):
+        """
+        Serialize a Python object to bytes
+
+        Args:
+            obj: JSON-compatible object (dict, list, str, int, float, bool, None)
+
+        Returns:
+            Encoded bytes (in the fallback's format if the backend could not encode obj)
+        """
+        return self.encode_as(obj)[1]
+
+    def decode(self, data):
+        """
+        Deserialize bytes to a Python object
+
+        Args:
+            data: Raw request body
+
+        Returns:
+            Decoded object
+
+        Raises:
+            CodecError: If the body is empty or malformed
+        """
+        if not data:
+            raise CodecError("Empty request body")
+        try:
+            return self._loads(data)
+        except Exception as e:
+            # A fallback for the same wire format may still parse it
+            # (orjson rejects integers wider than 64 bits, json does not)
+            if self.fallback is not None and self.fallback.mimetype == self.mimetype:
+                return self.fallback.decode(data)
+            raise CodecError(f"Malformed request body: {e}") from e
+
+    def __repr__(self):
+        return f"Codec({self.name!r}, {self.mimetype!r})"
+
+
+STDLIB_JSON_CODEC = Codec('json', JSON_MIMETYPE, _stdlib_dumps, _stdlib_loads)
+if JSON_BACKEND == 'json':
+    JSON_CODEC = STDLIB_JSON_CODEC
+else:
+    JSON_CODEC = Codec(JSON_BACKEND, JSON_MIMETYPE, _json_dumps, _json_loads, STDLIB_JSON_CODEC)
+
+if msgpack is not None:
+    MSGPACK_CODEC = Codec(
+        'msgpack',
+        MSGPACK_MIMETYPES[0],
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False),
+        # MessagePack has no integers wider than 64 bits; such replies go out as JSON
+        STDLIB_JSON_CODEC,
+    )
+else:
+    MSGPACK_CODEC = None
+
+
+# ============================================================
+# CONTENT NEGOTIATION
+# ============================================================
+def _mimetype(header):
+    """Strip parameters (charset etc.) and normalise a media type"""
+    return (header or '').split(';', 1)[0].strip().lower()
+
+
+def codec_for_content_type(content_type):
+    """
+    Select the codec used to decode a request body
+
+    Args:
+        content_type: Value of the Content-Type header (may be None)
+
+    Returns:
+        MessagePack codec for msgpack media types, otherwise the JSON codec
+    """
+    if MSGPACK_CODEC is not None and _mimetype(content_type) in MSGPACK_MIMETYPES:
+        return MSGPACK_CODEC
+    return JSON_CODEC
+
+
+def codec_for_accept(accept, default=None):
+    """
+    Select the codec used to encode a response
+
+    Args:
+        accept: Value of the Accept header (may be None)
+        default: Codec to use when Accept expresses no preference,
+                 normally the codec the request arrived in
+
+    Returns:
+        Codec with the highest q-value that we support
+    """
+    if default is None:
+        default = JSON_CODEC
+    if not accept:
+        return default
+
+    best, best_q = None, 0.0
+    for item in accept.split(','):
+        parts = item.split(';')
+        media = parts[0].strip().lower()
+        q = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q <= best_q:
+            continue
+        if media in MSGPACK_MIMETYPES and MSGPACK_CODEC is not None:
+            best, best_q = MSGPACK_CODEC, q
+        elif media in (JSON_MIMETYPE, 'application/*', '*/*'):
+            best, best_q = (default if media != JSON_MIMETYPE else JSON_CODEC), q
+
+    return best or default
+
+
+def available_codecs():
+    """Return the names of the wire formats this process can speak"""
+    names = [JSON_CODEC.name]
+    if MSGPACK_CODEC is not None:
+        names.append(MSGPACK_CODEC.name)
+    return names
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Codec benchmark for the REST and JSON-RPC servers
+Compares stdlib JSON, the fast JSON backend and MessagePack,
+both as raw encode/decode and end-to-end through the Flask apps
+"""
+
+import argparse
+import time
+
+import api_codecs
+from api_codecs import MSGPACK_CODEC, STDLIB_JSON_CODEC
+
+# Values where fast backends are known to differ from the stdlib json
+# module they stand in for
+PARITY_CASES = [
+    {"a": 10 ** 10, "b": 10 ** 10, "result": 10 ** 20},
+    [2 ** 63 - 1, -2 ** 63, 2 ** 64, -2 ** 64 - 1, 10 ** 30],
+    {"text": "h\u00e9llo \u2603 \U0001F680", "nested": [[1, [2, [3.5]]], {"k": None, "t": True}]},
+    [0.1, 1e-300, 1.7976931348623157e308, 123456789.123456789],
+    {"nan": float('nan'), "inf": float('inf'), "-inf": float('-inf'), "product": 1e308 * 10, "none": None},
+]
+
+
+def _same(a, b):
+    """Equal as stdlib json sees it (NaN matches NaN, 1 does not match 1.0)"""
+    return STDLIB_JSON_CODEC.encode(a) == STDLIB_JSON_CODEC.encode(b)
+
+
+def check_codecs(codecs):
+    """
+    Verify every codec round-trips the parity cases exactly like stdlib json,
+    and that the JSON codecs parse stdlib-encoded text to the same values
+
+    Raises:
+        AssertionError: On the first mismatch
+    """
+    for label, codec in codecs:
+        for case in PARITY_CASES:
+            used, data = codec.encode_as(case)
+            assert _same(used.decode(data), case), f"{label}: round trip changed {case!r}"
+            if codec.mimetype == api_codecs.JSON_MIMETYPE:
+                assert _same(codec.decode(STDLIB_JSON_CODEC.encode(case)), case), f"{label}: decode changed {case!r}"
+                assert _same(STDLIB_JSON_CODEC.decode(data), case), f"{label}: encode changed {case!r}"
+
+
+def bench_codec(codec, payload, iterations):
+    """
+    Time encode + decode of a payload
+
+    Returns:
+        Microseconds per round trip
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.decode(codec.encode(payload))
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_app(client, path, body, codec, iterations):
+    """
+    Time POSTs through a Flask test client
+
+    Returns:
+        Requests per second
+    """
+    data = codec.encode(body)
+    headers = {'Content-Type': codec.mimetype, 'Accept': codec.mimetype}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        r = client.post(path, data=data, headers=headers)
+        codec.decode(r.data)
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--iterations', type=int, default=5000)
+    args = parser.parse_args()
+
+    fast = api_codecs.JSON_CODEC
+    codecs = [('json (stdlib)', STDLIB_JSON_CODEC), (f'json ({fast.name})', fast)]
+    if MSGPACK_CODEC is not None:
+        codecs.append(('msgpack', MSGPACK_CODEC))
+
+    check_codecs(codecs)
+    print("Parity with stdlib json: OK (" + ", ".join(label for label, _ in codecs) + ")")
+    print()
+
+    rpc_body = {"jsonrpc": "2.0", "method": "add", "params": [10, 5], "id": 1}
+    batch_body = {"jsonrpc": "2.0", "method": "add", "params": list(range(500)), "id": 1}
+    # REST /add on two lists concatenates them, so both the request and the
+    # response carry 4000 floats; with {"a": 10, "b": 5} the codec is a tiny
+    # fraction of the Flask request cost and the backends measure the same
+    big_body = {"a": [i * 1.5 for i in range(2000)], "b": [i * 0.25 for i in range(2000)]}
+
+    print("=" * 60)
+    print(f"Codec round trip (us/op, {args.iterations} iterations)")
+    print("=" * 60)
+    for label, codec in codecs:
+        small = bench_codec(codec, rpc_body, args.iterations)
+        large = bench_codec(codec, batch_body, args.iterations)
+        print(f"{label:<20} small: {small:8.2f}   500-param: {large:8.2f}")
+
+    from all_three_apis import jsonrpc_app, rest_app
+    rest = rest_app.test_client()
+    rpc = jsonrpc_app.test_client()
+
+    print()
+    print("=" * 60)
+    print(f"End-to-end through Flask (req/s, {args.iterations} requests)")
+    print("=" * 60)
+    for label, codec in codecs:
+        # Route the server's JSON decoding/encoding through the codec under test too
+        api_codecs.JSON_CODEC = codec if codec.mimetype == api_codecs.JSON_MIMETYPE else fast
+        rest_rps = bench_app(rest, '/add', {"a": 10, "b": 5}, codec, args.iterations)
+        big_rps = bench_app(rest, '/add', big_body, codec, max(1, args.iterations // 10))
+        rpc_rps = bench_app(rpc, '/', rpc_body, codec, args.iterations)
+        print(f"{label:<20} REST /add: {rest_rps:9.0f}   REST /add 4000 floats: {big_rps:9.0f}   "
+              f"JSON-RPC add: {rpc_rps:9.0f}")
+    api_codecs.JSON_CODEC = fast
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Asyncio engine for the Webex ISS bot
+- Watches many rooms from one event loop
+- Each "/seconds" command becomes its own task: the delay is an
+  asyncio.sleep, and the blocking ISS lookup, geocode and post run in
+  worker threads, so one slow command never stalls other rooms
+- Each room is polled on an adaptive interval: tight right after a
+  command, backing off while the room is idle
+"""
+
+import asyncio
+
+from adaptive_poll import AdaptivePoller
+from bot_tracing import new_trace_id
+from iss_bot import MessageCursor, parse_command
+
+
+class AsyncBotEngine:
+    """Schedules polling and command handling for a set of rooms"""
+
+    def __init__(self, bot, room_ids, poll_interval=1.0, max_poll_interval=120.0, max_concurrent=16,
+                 receiver=None, log=print):
+        """
+        Args:
+            bot: iss_bot.IssBot doing the API calls
+            room_ids: Webex room IDs to monitor
+            poll_interval: Seconds between polls of a room right after a command
+            max_poll_interval: Seconds between polls of a room that has been idle for long
+            max_concurrent: Commands allowed to run their pipeline at once
+            receiver: Optional webex_webhook.WebhookReceiver; its events are
+                      handled immediately and polling becomes a safety net
+            log: Output function
+        """
+        self.bot = bot
+        self.room_ids = list(room_ids)
+        self.poll_interval = poll_interval
+        self.receiver = receiver
+        self.log = log
+        self.cursors = {room_id: MessageCursor() for room_id in self.room_ids}
+        self.pollers = {
+            # Every room is polled on the same Webex host and shares its quota
+            room_id: AdaptivePoller(poll_interval, max(poll_interval, max_poll_interval),
+                                    share=len(self.room_ids))
+            for room_id in self.room_ids
+        }
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._tasks = set()
+
+    async def run(self):
+        """Run until cancelled"""
+        watchers = [self.watch_room(room_id) for room_id in self.room_ids]
+        if self.receiver is not None:
+            watchers.append(self.watch_webhooks())
+        try:
+            await asyncio.gather(*watchers)
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+
+    async def watch_room(self, room_id):
+        poller = self.pollers[room_id]
+        while True:
+            messages = []
+            try:
+                messages = await asyncio.to_thread(self.bot.new_messages, room_id, self.cursors[room_id])
+                for message in messages:
+                    self.handle_message(room_id, message, self.bot.last_poll.get(room_id))
+            except Exception as e:
+                self.log("Error polling room {}: {}".format(room_id, e))
+            poller.after_poll(bool(messages))
+            poller.observe_rate_limit(self.bot.client.rate_limit(self.bot.api_base))
+            await asyncio.sleep(poller.next_delay())
+
+    def poll_stats(self):
+        """
+        Returns:
+            Dict of room ID -> current poll interval and call counts
+        """
+        return {room_id: poller.stats() for room_id, poller in self.pollers.items()}
+
+    async def watch_webhooks(self):
+        while True:
+            event = await asyncio.to_thread(self.receiver.next_event, 1.0)
+            if event is None or event.get("roomId") not in self.room_ids:
+                continue
+            # Fetch in its own task, so one slow or retrying fetch does not
+            # hold back events for the other rooms
+            self._spawn(self.handle_event(event))
+
+    async def handle_event(self, event):
+        try:
+            message = await asyncio.to_thread(self.bot.fetch_message, event["id"])
+            self.handle_message(event["roomId"], message)
+        except Exception as e:
+            self.log("Error fetching message {}: {}".format(event.get("id"), e))
+
+    def handle_message(self, room_id, message, poll=None):
+        """
+        Act on a message once; commands are scheduled as background tasks
+
+        The room's cursor remembers handled IDs, so a message seen by both
+        the webhook and the safety poll still runs the pipeline only once.
+
+        Args:
+            room_id: Room the message was posted in
+            message: Webex message
+            poll: bot_tracing.Span of the poll that returned the message;
+                  it is logged under the command's trace
+
+        Returns:
+            The scheduled task, or None if nothing was scheduled
+        """
+        if not self.cursors[room_id].mark_seen(message):
+            return None
+
+        text = message.get("text", "")
+        self.log("Received message: " + text)
+        try:
+            seconds = parse_command(text)
+        except ValueError as e:
+            self.log("Error: {}".format(e))
+            return None
+        if seconds is None:
+            return None
+
+        self.pollers[room_id].wake()
+        trace_id = new_trace_id()
+        self.bot.tracer.link(poll, trace_id)
+        return self._spawn(self.run_command(room_id, seconds, trace_id))
+
+    def _spawn(self, coro):
+        """Run a coroutine as a background task that run() cancels on exit"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run_command(self, room_id, seconds, trace_id=None):
+        tracer = self.bot.tracer
+        tracer.start_trace(trace_id)
+        await asyncio.sleep(seconds)
+        async with self._slots:
+            try:
+                with tracer.span('command', room=room_id, delay=seconds):
+                    text = await asyncio.to_thread(self.bot.lookup_flyover)
+                    self.log("Sending to Webex: " + text)
+                    await asyncio.to_thread(self.bot.post_message, room_id, text)
+            except Exception as e:
+                self.log("Error handling command in room {}: {}".format(room_id, e))
+                return None
+        return text
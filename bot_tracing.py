@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Per-stage tracing for the Webex ISS bot
+- Every command gets a trace ID; its stages (poll, iss, geocode, post)
+  are timed as spans carrying the HTTP status and retry count of the
+  calls made inside them. A poll runs before any command is known, so
+  the poll that finds one is logged again under the command's trace
+- Finished spans are written as JSON lines to a logger (a rotating
+  file via setup_trace_log) and kept in a rolling window per stage
+  for p50/p99 figures
+"""
+
+import contextvars
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+TRACE_LOGGER = 'iss_bot.trace'
+
+# The trace and span of the code running now; asyncio.to_thread copies
+# the context, so spans opened around a worker-thread call still see
+# the HTTP requests made in that thread
+_current_trace = contextvars.ContextVar('iss_bot_trace', default=None)
+_current_span = contextvars.ContextVar('iss_bot_span', default=None)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100) of a non-empty sequence"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def new_trace_id():
+    """Random 16-hex-digit ID for a trace or span"""
+    return uuid.uuid4().hex[:16]
+
+
+def observe_http(method, url, status, retries, seconds):
+    """
+    http_client.ApiClient observer: attach the call to the open span
+
+    The span knows its own tracer, so one registration per client serves
+    every tracer and bot using that client.
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.http.append((status, retries))
+
+
+def setup_trace_log(path, max_bytes=5 * 1024 * 1024, backup_count=5):
+    """
+    Send trace spans to a size-rotated JSON-lines file
+
+    Returns:
+        The trace logger
+    """
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger(TRACE_LOGGER)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+class Span:
+    """One timed stage; fields set on it end up in the log record"""
+
+    def __init__(self, tracer, stage, trace_id, fields):
+        self.tracer = tracer
+        self.stage = stage
+        self.trace_id = trace_id
+        self.span_id = new_trace_id()
+        self.fields = dict(fields)
+        self.http = []
+        self.error = None
+        self.seconds = None
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def record(self, trace_id=None):
+        record = {
+            "ts": round(time.time(), 3),
+            "trace": trace_id if trace_id is not None else self.trace_id,
+            "span": self.span_id,
+            "stage": self.stage,
+            "ms": round(self.seconds * 1e3, 2),
+        }
+        if self.http:
+            record["status"] = self.http[-1][0]
+            record["retries"] = sum(retries for _, retries in self.http)
+            record["calls"] = len(self.http)
+        if self.error is not None:
+            record["error"] = self.error
+        record.update(self.fields)
+        return record
+
+
+class Tracer:
+    """Creates spans, logs them and keeps rolling per-stage latencies"""
+
+    def __init__(self, logger=None, window=1000):
+        """
+        Args:
+            logger: logging.Logger for span records (defaults to the
+                    "iss_bot.trace" logger; silent until a handler is added)
+            window: Latest spans per stage kept for percentiles
+        """
+        self.logger = logger if logger is not None else logging.getLogger(TRACE_LOGGER)
+        self.window = window
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def start_trace(self, trace_id=None):
+        """
+        Begin a trace in the current context (one per command)
+
+        Args:
+            trace_id: ID picked earlier with new_trace_id(), e.g. when the
+                      command was found; a new one by default
+        """
+        if trace_id is None:
+            trace_id = new_trace_id()
+        _current_trace.set(trace_id)
+        return trace_id
+
+    def link(self, span, trace_id):
+        """
+        Log a finished span again under a trace it led to
+
+        Used for the poll that found a command: the record keeps the poll's
+        span ID and duration but carries the command's trace ID. It is not
+        counted twice in the percentiles.
+        """
+        if span is not None and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(json.dumps(span.record(trace_id)))
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """
+        Time a stage
+
+        Usage:
+            with tracer.span('post', room=room_id) as span:
+                ...
+                span.set(items=3)
+        """
+        span = Span(self, stage, _current_trace.get(), fields)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = "{}: {}".format(type(e).__name__, e)
+            raise
+        finally:
+            span.seconds = time.perf_counter() - start
+            _current_span.reset(token)
+            self._finish(span)
+
+    def _finish(self, span):
+        with self._lock:
+            durations = self._durations.get(span.stage)
+            if durations is None:
+                durations = self._durations[span.stage] = deque(maxlen=self.window)
+            durations.append(span.seconds)
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(json.dumps(span.record()))
+
+    def percentiles(self, stage):
+        """
+        Returns:
+            Dict with count, p50_ms and p99_ms over the rolling window,
+            or None if the stage has not been traced yet
+        """
+        with self._lock:
+            durations = list(self._durations.get(stage, ()))
+        if not durations:
+            return None
+        return {
+            "count": len(durations),
+            "p50_ms": round(percentile(durations, 50) * 1e3, 2),
+            "p99_ms": round(percentile(durations, 99) * 1e3, 2),
+        }
+
+    def summary(self):
+        """Rolling percentiles for every traced stage"""
+        with self._lock:
+            stages = sorted(self._durations)
+        return {stage: self.percentiles(stage) for stage in stages}
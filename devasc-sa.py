@@ -2,11 +2,14 @@
 # This program:
 # - Asks the user to enter an access token or use the hard coded access token.
 # - Lists the user's Webex rooms.
-# - Asks the user which Webex room to monitor for "/seconds" of requests.
+# - Asks the user which Webex room(s) to monitor for "/seconds" of requests.
 # - Monitors the selected Webex Team room every second for "/seconds" messages.
+#   (or, in webhook mode, is notified by Webex as soon as a message is posted).
 # - Discovers GPS coordinates of the ISS flyover using ISS API.
 # - Display the geographical location using Graphhopper API based on the GPS coordinates.
 # - Formats and sends the results back to the Webex Team room.
+# The API calls for steps 5-8 and 10-13 live in iss_bot.py; bot_engine.py schedules them.
+# replay_bench.py runs the same pipeline offline against recorded API fixtures.
 #
 # The student will:
 # 1. Import libraries for API requests, JSON formatting, parsing URLs into components, and epoch time conversion.
@@ -27,190 +30,163 @@
 #######################################################################################
 # 1. Import libraries for API requests, JSON formatting, parsing URLs into components, and epoch time conversion.
 
-import requests
-import json
-import urllib.parse
-import time
+import os
+import uuid
+import asyncio
 
-# 2. Complete the if statement to ask the user for the Webex access token.
-choice = input("Do you wish to use the hard-coded Webex token? (y/n) ")
+from bot_engine import AsyncBotEngine
+from bot_tracing import setup_trace_log
+from geocode_cache import ReverseGeocodeCache
+from http_client import get_client
+from iss_bot import IssBot
+from room_directory import RoomDirectory
+from webex_webhook import WebhookReceiver, register_webhook, delete_webhook
 
-if choice == "N" or choice == "n":
-    accessToken = "Bearer " + input("Enter your Webex access token: ")
-else:
-    accessToken = "Bearer OGQxMzAxYjItM2I2NC00NWRjLWFlNTQtMGMzMGZjM2EyOGMwYjZjODQyOGUtMmU0_P0A1_13494cac-24b4-4f89-8247-193cc92a7636"
+# Shared keep-alive connection pools with timeouts and retry/backoff for every API call
+api = get_client()
 
-# 3. Provide the URL to the Webex room API.
-r = requests.get(   "https://webexapis.com/v1/rooms",
-                    headers = {"Authorization": accessToken}
-                )
+# Base URL of the Webex API (override with WEBEX_API_URL to run against a local stand-in)
+webexApiUrl = os.environ.get("WEBEX_API_URL", "https://webexapis.com/v1")
 
-#######################################################################################
-# DO NOT EDIT ANY BLOCKS WITH r.status_code
-if not r.status_code == 200:
-    raise Exception("Incorrect reply from Webex API. Status code: {}. Text: {}".format(r.status_code, r.text))
-######################################################################################
-#
-# 4. Create a loop to print the type and title of each room.
-print("\nList of available rooms:")
-rooms = r.json()["items"]
-for room in rooms:
-    print("Type: '" + room["type"] + "' Name: " + room["title"])
+# Hard-coded credentials, overridable from the environment
+defaultAccessToken = os.environ.get("WEBEX_ACCESS_TOKEN", "OGQxMzAxYjItM2I2NC00NWRjLWFlNTQtMGMzMGZjM2EyOGMwYjZjODQyOGUtMmU0_P0A1_13494cac-24b4-4f89-8247-193cc92a7636")
+graphhopperKey = os.environ.get("GRAPHHOPPER_KEY", "813197c3-1b03-4bdb-88e6-4c2e7cf2cd98")
 
 #######################################################################################
-# SEARCH FOR WEBEX ROOM TO MONITOR
-#  - Searches for user-supplied room name.
-#  - If found, print "found" message, else prints error.
-#  - Stores values for later use by bot.
-# DO NOT EDIT CODE IN THIS BLOCK
-#######################################################################################
+# Everything interactive runs from main(), so the module (and the bot
+# pipeline it wires together) can be imported without prompting.
 
-while True:
-    roomNameToSearch = input("Which room should be monitored for the /seconds messages? ")
-    roomIdToGetMessages = None
-    
-    for room in rooms:
-        if(room["title"].find(roomNameToSearch) != -1):
-            print ("Found rooms with the word " + roomNameToSearch)
-            print(room["title"])
-            roomIdToGetMessages = room["id"]
-            roomTitleToGetMessages = room["title"]
-            print("Found room: " + roomTitleToGetMessages)
-            break
+def main():
+    # 2. Complete the if statement to ask the user for the Webex access token.
+    choice = input("Do you wish to use the hard-coded Webex token? (y/n) ")
 
-    if(roomIdToGetMessages == None):
-        print("Sorry, I didn't find any room with " + roomNameToSearch + " in it.")
-        print("Please try again...")
+    if choice == "N" or choice == "n":
+        accessToken = "Bearer " + input("Enter your Webex access token: ")
     else:
-        break
-        
-######################################################################################
-# WEBEX BOT CODE
-#  Starts Webex bot to listen for and respond to /seconds messages.
-######################################################################################
-
-while True:
-    time.sleep(1)
-    GetParameters = {
-                            "roomId": roomIdToGetMessages,
-                            "max": 1
-                    }
-# 5. Provide the URL to the Webex messages API.    
-    r = requests.get("https://webexapis.com/v1/messages", 
-                         params = GetParameters, 
-                         headers = {"Authorization": accessToken}
-                    )
-    # verify if the retuned HTTP status code is 200/OK
-    if not r.status_code == 200:
-        raise Exception( "Incorrect reply from Webex API. Status code: {}. Text: {}".format(r.status_code, r.text))
-
-    json_data = r.json()
-    if len(json_data["items"]) == 0:
-        raise Exception("There are no messages in the room.")
-    
-    messages = json_data["items"]
-    message = messages[0]["text"]
-    print("Received message: " + message)  
-    
-    if message.find("/") == 0:    
-        if (message[1:].isdigit()):
-            seconds = int(message[1:])  
-        else:
-            raise Exception("Incorrect user input.")
-    
-    #for the sake of testing, the max number of seconds is set to 5.
-        if seconds > 5:
-            seconds = 5    
-            
-        time.sleep(seconds)     
-    
-# 6. Provide the URL to the ISS Current Location API.         
-        r = requests.get("http://api.open-notify.org/iss-now.json")
-        
-        json_data = r.json()
-        
-        if not json_data["message"] == "success":
-            raise Exception("Incorrect reply from Open Notify API. Status code: {}".format(r.statuscode))
-
-# 7. Record the ISS GPS coordinates and timestamp.
-
-        lat = json_data["iss_position"]["latitude"]
-        lng = json_data["iss_position"]["longitude"]
-        timestamp = json_data["timestamp"]
-        
-# 8. Convert the timestamp epoch value to a human readable date and time.
-        # Use the time.ctime function to convert the timestamp to a human readable date and time.
-        timeString = time.ctime(timestamp)     
-   
-# 9. Provide your Graphhopper API consumer key.
-    
-        key = "813197c3-1b03-4bdb-88e6-4c2e7cf2cd98"
-
-# 10. Provide the URL to the Graphhopper GeoCoding API.
-    # Get location information using the Graphhopper GeoCoding API service using the HTTP GET method
-        GeoURL = "https://graphhopper.com/api/1/geocode?"
-
-        loc="&point="+lat+","+lng
-        url = GeoURL + urllib.parse.urlencode({"key":key, "reverse":"true"}) + loc
-        r = requests.get(url)
-
-    # Verify if the returned JSON data from the Graphhopper API service are OK
-        json_data = r.json()
-    # check if the status key in the returned JSON data is "200"
-        if not r.status_code == 200:
-            raise Exception("Graphhopper Error message: " + json_data["message"])
-
-# 11. Store the location received from the Graphhopper.
-        if len(json_data["hits"]) != 0:
-            CountryResult = json_data["hits"][0]["country"]
-            NameResult = json_data["hits"][0]["name"]
-            if "state" in json_data["hits"][0]:
-                StateResult = json_data["hits"][0]["state"]
-            if "city" in json_data["hits"][0]:
-                CityResult = json_data["hits"][0]["city"]
-            if "street" in json_data["hits"][0]:
-                StreetResult = json_data["hits"][0]["street"]
-            if "housenumber" in json_data["hits"][0]:
-                HouseResult = json_data["hits"][0]["housenumber"]
-
-# 12. Complete the code to format the response message.
-#     Example responseMessage result: On Tue Mar 12 00:16:04 2024 (GMT), the ISS was flying over Mobert Creek, Canada. (47.4917°, -37.3643°)
-        #responseMessage = "On {} (GMT), the ISS was flying over {}, {}. ({}\", {}\")".format(timeString, NameResult, CountryResult, lat, lng)
-
-        if len(json_data["hits"]) == 0:
-            responseMessage = "On {} (GMT), the ISS was flying over a body of water or unpopulated area at latitude {}° and longitude {}°.".format(timeString, lat, lng)
-        elif "street" in json_data["hits"][0] and "city" in json_data["hits"][0]:
-            responseMessage = "On {} (GMT), the ISS was flying over {} in {}, {}. ({}°, {}°)".format(timeString, StreetResult, CityResult, CountryResult, lat, lng)
-        elif "city" in json_data["hits"][0]:
-            responseMessage = "On {} (GMT), the ISS was flying over {}, {}. ({}°, {}°)".format(timeString, CityResult, CountryResult, lat, lng)
-        elif "name" in json_data["hits"][0]:
-            responseMessage = "On {} (GMT), the ISS was flying over {} in {}. ({}°, {}°)".format(timeString, NameResult, CountryResult, lat, lng)
-        else:
-            responseMessage = "On {} (GMT), the ISS was flying over {}. ({}°, {}°)".format(timeString, CountryResult, lat, lng)
-       
-        # print the response message
-        print("Sending to Webex: " +responseMessage)
-
-# 13. Complete the code to post the message to the Webex room.         
-        # the Webex HTTP headers, including the Authoriztion and Content-Type
-        HTTPHeaders = { 
-                             "Authorization": accessToken,
-                             "Content-Type": "application/json"
-                           }
-        
-        PostData = {
-                            "roomId": roomIdToGetMessages,
-                            "text": responseMessage
-                        }
-        # Post the call to the Webex message API.
-        r = requests.post( "https://webexapis.com/v1/messages", 
-                              data = json.dumps(PostData), 
-                              headers = HTTPHeaders
+        accessToken = "Bearer " + defaultAccessToken
+
+    # 3. Provide the URL to the Webex room API.
+    # The directory follows the rooms API's pagination, keeps the list in a
+    # local cache (only rooms active since the last run are re-fetched) and
+    # indexes the titles for the searches below. A non-200 reply raises the
+    # usual "Incorrect reply from Webex API" exception.
+    rooms = RoomDirectory(accessToken, webexApiUrl, api,
+                          os.path.expanduser("~/.cache/iss-bot")
                          )
-        if not r.status_code == 200:
-            raise Exception("Incorrect reply from Webex API. Status code: {}. Text: {}".format(r.status_code, r.text))
-
-
+    rooms.refresh()
 
+    #
+    # 4. Create a loop to print the type and title of each room.
+    print("\nList of available rooms:")
+    for room in rooms:
+        print("Type: '" + room["type"] + "' Name: " + room["title"])
+
+    #######################################################################################
+    # SEARCH FOR WEBEX ROOM TO MONITOR
+    #  - Searches for user-supplied room name.
+    #  - If found, print "found" message, else prints error.
+    #  - Stores values for later use by bot.
+    # DO NOT EDIT CODE IN THIS BLOCK
+    #######################################################################################
+
+    while True:
+        roomNameToSearch = input("Which room should be monitored for the /seconds messages? ")
+        roomIdToGetMessages = None
+
+        for room in rooms.search(roomNameToSearch):
+            if(room["title"].find(roomNameToSearch) != -1):
+                print ("Found rooms with the word " + roomNameToSearch)
+                print(room["title"])
+                roomIdToGetMessages = room["id"]
+                roomTitleToGetMessages = room["title"]
+                print("Found room: " + roomTitleToGetMessages)
+                break
+
+        if(roomIdToGetMessages == None):
+            print("Sorry, I didn't find any room with " + roomNameToSearch + " in it.")
+            print("Please try again...")
+        else:
+            break
 
+    # Optionally monitor more rooms from the same bot.
+    roomIdsToGetMessages = [roomIdToGetMessages]
+    extraRooms = input("Other rooms to monitor as well (comma separated, blank for none)? ")
+    for extraRoomName in [name.strip() for name in extraRooms.split(",") if name.strip()]:
+        matches = rooms.search(extraRoomName)
+        if len(matches) == 0:
+            print("Sorry, I didn't find any room with " + extraRoomName + " in it.")
+        elif matches[0]["id"] not in roomIdsToGetMessages:
+            print("Found room: " + matches[0]["title"])
+            roomIdsToGetMessages.append(matches[0]["id"])
+
+    ######################################################################################
+    # WEBEX BOT CODE
+    #  Starts Webex bot to listen for and respond to /seconds messages.
+    ######################################################################################
+
+    # 9. Provide your Graphhopper API consumer key.
+
+    key = graphhopperKey
+
+    # Each command's poll/ISS/geocode/post stages are timed and written as
+    # JSON lines to a rotating trace log (one span per stage).
+    traceLog = os.path.expanduser(os.environ.get("ISS_BOT_TRACE_LOG", "~/.cache/iss-bot/trace.log"))
+    os.makedirs(os.path.dirname(traceLog), exist_ok = True)
+    setup_trace_log(traceLog)
+
+    # Points over open ocean are answered offline; land lookups are cached per
+    # grid cell in memory and on disk so repeat passes skip the API.
+    bot = IssBot(accessToken, key, webexApiUrl, api,
+                 ReverseGeocodeCache(os.path.expanduser("~/.cache/iss-bot/geocode.sqlite3"))
+                )
 
+    # Webhook mode: Webex pushes a message-created event to a local receiver
+    # and the bot reacts immediately. Polling remains the fallback.
+    receiver = None
+    webhookIds = []
+    # Webhook mode still polls once in a while as a safety net in case an
+    # event is lost; only messages that have not been handled are acted on.
+    webhookSafetyPoll = 30
+    mode = input("Do you wish to use webhook mode? (y/n) ")
+
+    if mode == "Y" or mode == "y":
+        targetUrl = input("Public URL that forwards to this machine (e.g. https://xxxx.ngrok.io/): ")
+        webhookSecret = uuid.uuid4().hex
+        receiver = WebhookReceiver(port = int(os.environ.get("WEBHOOK_PORT", "8080")),
+                                   secret = webhookSecret
+                                  ).start()
+        try:
+            for roomId in roomIdsToGetMessages:
+                webhookIds.append(register_webhook(accessToken, targetUrl, roomId, webhookSecret, webexApiUrl))
+            print("Webhook registered, listening on port {}".format(receiver.port))
+        except Exception as e:
+            print("Could not register webhook ({}). Falling back to polling.".format(e))
+            receiver.stop()
+            receiver = None
+
+    # Every room is polled from one asyncio scheduler; each /seconds command
+    # runs as its own task so a slow lookup in one room does not block others.
+    # A room is polled every second right after a command and less and less
+    # often while it stays quiet (up to every 2 minutes), instead of once a
+    # second around the clock.
+    engine = AsyncBotEngine(bot, roomIdsToGetMessages,
+                            poll_interval = webhookSafetyPoll if receiver is not None else 1,
+                            max_poll_interval = 10 * webhookSafetyPoll if receiver is not None else 120,
+                            receiver = receiver
+                           )
+
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for roomId, stats in engine.poll_stats().items():
+            print("Room {}: polled every {}s, {} calls in the last hour".format(roomId, stats["interval"], stats["calls_last_hour"]))
+        for stage, figures in bot.tracer.summary().items():
+            print("Stage {}: p50 {} ms, p99 {} ms over {} spans".format(stage, figures["p50_ms"], figures["p99_ms"], figures["count"]))
+        for webhookId in webhookIds:
+            delete_webhook(accessToken, webhookId, webexApiUrl)
+
+
+if __name__ == "__main__":
+    main()
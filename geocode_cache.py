@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Reverse-geocode cache for the Webex ISS bot
+- Quantizes lat/lng to a grid cell and caches the Graphhopper "hits"
+  for that cell: in-memory LRU in front of an on-disk SQLite tier,
+  both with a TTL
+- Offline land/ocean pre-check from a bundled 0.5 degree raster, so
+  points over open water (about two-thirds of the ground track) never
+  reach the API
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ============================================================
+# OFFLINE OCEAN MASK
+# 0.5 x 0.5 degree cells from 52N (first row) to 52S (last row), which
+# covers the ISS ground track (+/-51.6 degrees); columns from 180W
+# eastwards. Built from the NOAA GLOBE 30-arc-second land mask: a cell
+# counts as land if any land pixel lies in it or within ~5.5 km of it
+# (coasts, atolls, rocks), so a cell is open ocean only if it is
+# certain to be water; a miss costs an API call, never a wrong answer.
+# Points outside the raster are treated as unknown.
+# Each row is run-length encoded as two base-36 digits per run,
+# alternating ocean and land and starting with ocean (possibly 0).
+# ============================================================
+OCEAN_MASK_CELL = 0.5
+OCEAN_MASK_NORTH = 52
+OCEAN_MASK_RLE = (
+    # 52N
+    "010d2b0203442g07040e037t0p051106",
+    "01032r432i03078401050o041503",
+    "2t3y01062r8501050m041a",
+    "2v3v02062p09067s01060k041b",
+    # 50N
+    "2x3e0306070a2m030404027u02050j031d",
+    "2y3n050c2s8001070g041e",
+    "303g090e2m84020401020g031f",
+    "323e090e2m8402030k011h",
+    "323e0402030e2n8203030j021h",
+    "333e0205050a2q7y04040g031i",
+    "333l070301042s7v05050d0101021j",
+    "333m3725025m050301020b031m",
+    "333m381s0408025l050401010a041n",
+    "333k3a1r045v060508041q",
+    "333i3c0t010x0607015k090405051r",
+    "333701070502380t020u0803075h090d1t",
+    "3334040408022u0b020l0209010t0k5e0a0c1u",
+    "32320703330y030a030r0l5c090d1v",
+    "32313e0q0502030c020p0p580a0c1x",
+    "33323c0q090h030l09050b500g0a20",
+    "33323d0p0a03030a050j060a094z0h05030121",
+    "33323d0o0a04040b03670g0724",
+    "332y3h0l0d04050c01660h0724",
+    "332u3l0k04030704085y010g0k0623",
+    # 40N
+    "332u2c01160l030507040a5v010f0m0623",
+    "342s2d0105020z0k020509040b04045k020602070m0723",
+    "342r2j050x0l01020c0307010107055i030602090k0624",
+    "352q2j03100j0n0b065j020107090i0824",
+    "352p2q020w0h0i02040a085i0105040a02010b02010725",
+    "362n2s020u0h0e0b02060c5n050802010101090a25",
+    "372m2s020u04010b040o03030c5n05090c0b25",
+    "382l3u04090m06010f03030c0106014t08090502040b26",
+    "382m3t030302020q010202020g030101020408010103014r0a08050h26",
+    "392l3t1001020k090905024p0b09040i26",
+    "3a2i3u110o060b05024p0a0a020j27",
+    "3a2g3w101d4q0907010h030228",
+    "3b2e3u141b4s08010103030f050228",
+    "3c2b3g010e17194t0903020c0102070128",
+    "3e0201253f030d1d0a070m4u0e0a0c0128",
+    "3h230u012n020d1e080c0i4v0c0102050f0128",
+    "3i213x1g070f0605034w0c0102052o",
+    "3i203y1k035p0e052p",
+    "3j04021t3y1m015r0c050h0127",
+    "3j05011t3m010b7e0d040h0127",
+    # 30N
+    "3k1j050a3x7f0c022s",
+    "3f01051703080a063p02043b03410d022s",
+    "3f010614080201010c063f0202010303033d03400c032s",
+    "030101013e0201110q063g09013g0201013y0e032r",
+    "3l120r063f070101013k013x0d030p0123",
+    "3m07010s0s0603023j2p010u053u0c030n01020123",
+    "3n07010r0t0c3g2q020u053s0c040q0123",
+    "0b023c05030p0t0601053f2r030v0404013m0b0405010l0123",
+    "0g013a04020p0u0401063f2s020x033p0301010201010c010j0125",
+    "3r04020p0v03010101053e2s030v01010205043f0104110125",
+    "3r05030n0t0502083b2u020y01060901092z010b0a010j0125",
+    "3r06030l0u0202010309382w02150j2w020401040d010j020n021f",
+    "0r013105030k0y0104020105372y02170g2u0206030134",
+    "10012u03040j0s0806040101362x04170h2s020638",
+    "3v02060i0f010a0d04010104352y04170h2p060438",
+    "13032y0h0c010201090f03010107313102170h2l0a0438",
+    "120401022t0k0g05030h06052z3202170i2j0c0338",
+    "17052q02010h0902020806030409030301022z3203150k10010205160i0237",
+    "19042r0j080102090e0a0102333203150l04010u090w02040b01090218011y",
+    "1a042q0k0a090g090102343003150q0t0a0u010103040k020r010g021x",
+    # 20N
+    "1b042p0k0a080d02030701092x3104110t0s0c0s04060k0219011x",
+    "1b042c0102010a0k08090b010f0a2v3303100t0q0f0q05050k032g010q",
+    "1c022d0101020c0k020d0h03040e0104010201012l3302100t0p0g0r04050j041a011w",
+    "3m010l0x0i05010n01022k33030x0v0o0j0q03040j051a011w",
+    "4a0w0i040401030207040101020201012i33050u0w0n0k0q0q051a011w",
+    "4c0u06010n020f0420020g34040u0x0l0l0r0p0619011w",
+    "0k023t0q02021a031z060b350101020s0z0j0n0s07030e0619011w",
+    "4i0m010602011603200101020b37020n140j0n0u04020f061a021v",
+    "4k06010o150223020b3v150h0p04030n04020f061b011v",
+    "4t0n140220040b3w160e0y0o0g0103061a011w",
+    "4u0l16021z040a3b010i190e0q01070o0k08170219020l",
+    "4v0k16022e3b010e1d0d0p01080o0l0915011x",
+    "4w0i17022f3o1e0d0o02080o0k0a14021x",
+    "500e170102022c3l1i0c0o020101070n0l0914011y",
+    "540a0m0101030f0202022c3h0f04130c0o02080p0j0c31",
+    "550a0k0a010109022g3d0e010206130c0o03070o0k0d30",
+    "56070k0501060102020204012i3d0b041602030a0o030706040f0k0d200105020s",
+    "57060g0f0501010304022e3e050a150304090o020905050e0903070e2001080105010k",
+    "58060e0k010101082g3s150205090o020905060d0901080g2z",
+    "3x011a070d0v2j3p180103090o020905050b010208030704020a2602040202010i",
+    # 10N
+    "58080404040v2k3n1e0a0x060409040108020703020201090n0103021j0201010j",
+    "5a0f020w2l3m1e0b0m010906050201050l030301020401040n010d011302010304010j",
+    "5c1d2k3l1e0502040m03070607060k0308082a0105010i",
+    "5c1e2j3k1802060402050l03070608010n03080a0f011t0205010h",
+    "5e0702142i3j1n050m0208060v02090a0e020x010w030l",
+    "5f0602152i3i19020c050n0207060v05050b0e020h01050208010c010j0203030g",
+    "5o152j3f1a020c050n0209060s06040302070e010t010g020q010g",
+    "5o1701032e3e1a020c050y080p07020502061w010g0203020f",
+    "0y024o1f2c0o062i1a020d020r0308070n0e04041j0106010l01010203020f",
+    "5o1g2c0k0a2g1c02160604070m0d08021j010h020x",
+    "12014m1g2c0805040c2f1c021707030807020a0e0c02080220010m",
+    "5g01071i2d040o2e1c021807020807020a0b0f010a012n",
+    "14014b01081h3a281d03180702070702090a0e0201012y",
+    "5n1k390201241e01180102080106030301010101060c0e022l020d",
+    "5m1l3c231f02170k010202010102030e0e0204022f010e",
+    "18014d1m3b221h02170j01010503020g0c0104032g010d",
+    "18023l020o1o350202211j021a0f080l0b0203042f020d",
+    "4w010n1p350103202v03010d0402010m01070103010101042f020d",
+    "06014r010k1q391z1k031a02010d0303010x020101052e030c",
+    "06024o050i1s3102041x1m031b0f040m030b04092b020c",
+    # 0
+    "13023r040i1v2z02041w1o011c03010c060j030202040604010903011q010q",
+    "4w060g1y311x1o011d02010b080i02090704010e0h021501040208020a",
+    "4w050g222y1w340201090102050i030a060k0102080607021d0506",
+    "5i222y1u3503010c040h040k010k0606020302031c0308",
+    "5h262v1t370k010g0208010706030107020a0a0502031c0307",
+    "0g01512b2q1r390j010f0308060202060207010e09010407190306",
+    "0h01502d2p1p3b0i020d0102010a040b010r0b0601021e",
+    "0g030u02422f080101022d1n0u022h0101090b0202060102010a050b020q0c0501011e",
+    "0f0101010v02422g2p1m0u022k080h04060201050c010202010s050103071f",
+    "0a02030101014z2k2m1l0u022l070j010103020301050c020201060n0503010501020401030214",
+    "5h2l2l1l0q0110021n0102050g0203080206060107040102040v0303070214",
+    "1c01442l2m1k0q0202010x011n0103070101030203010202060601030102050207040102050u040207020w0107",
+    "5h2m2l1k0p020z011v0803020h0302010103090203020202060r06031401010105",
+    "5i2l2l1k0p0110011v0n0303010301010801040202030203060k0e0519",
+    "5i01012j2m1j0p0106010v021s0n01040205090601040302060j0f081001020102",
+    "26013d2j14011h1j3p0h040207010301030502060b0m0f0801010z0102",
+    "26013e2i14011i1i3w1401020c0d03060303090a03010w0101",
+    "17020y033c2h2m1j410u0p080407010608090z0101",
+    "17020y0201013b2g2n1j0c0207023l04010604070r060606010809070z01",
+    "11010l010j043c2f2o1i0c0405023q0505040w06040a01020d0609010p",
+    # 10S
+    "110216023c2e2p1k0d01060109022o020r03010201040y04070a0h03060201010p",
+    "0h010a011h013c2d2r1j0v012o020u050h0306010a020d080f0405020r",
+    "0h01562b2s1j04014e010e0804020a020f0201050a020b020q",
+    "0t014u2a2t1j0402060103014g0f09040j020b030b020p",
+    "5o292t1k050307032l011u0f08041e010f0205",
+    "5q272s1l070205044g0e09051t0205",
+    "070106020h014s262s1m080104064e0f080618030p",
+    "0e0458252t1m0d064605020g08061a020o",
+    "03020a040102190406013l242t1m0d0641020107020h070917030n",
+    "1q0304020b013g242t1m0c07440n0a0a140301010n",
+    "1r083t232s1n0a0a4001010q080916040n",
+    "00010701030111020b010205040102023l221t010y1n080c06023s0t070a06010y040m01",
+    "00020a01110104020a0903013n201t010y1m060e400w0102020a06010z030k03",
+    "00021c0303030102070601013s1x2t1l080d0h023g10010c05010z040g06",
+    "00031l020607010204023n1v2t1k0601010d4010010c0501020406010o020f07",
+    "010208011a01010201010501030302013u1u2s1h0b0d401d08010y020g0501",
+    "010307011r01010206033m1t2s1g0c0c401f1o0501",
+    "0004060307010j010z01040203023n1q2u1f0d0c3z1g17020g030101",
+    "0004070206020k020y0202023s1q2v1d0f0b3z1i0k0506010a030e030101",
+    "030105030v020o0208013v1q2w1a0h0a0g020a02311p0i010a0209030j",
+    # 20S
+    "09030v0101014t1p0l012b190i0a0g02361x0s03020205010k",
+    "020106021y033r1p0l012c190g0b0c020202361y0s0301030p",
+    "09020t0119043l1o2z1a0e0c0c0239200s0401030n",
+    "17020x0108033l1o30190e0b3m230s0401020n",
+    "07011d010t013n1o31180801050b3m230t0407010h",
+    "1i0102014g1n33180e0a3n230v0301010m",
+    "1o020r023j1n33180e0a3n241l",
+    "1s010x013b1h39180f093m261k",
+    "2v01361g3a180f093m271j",
+    "32012z1c3f160g083n291h",
+    "2r013a1b3g140i083m2a1h",
+    "621a3h120m033p2a1h",
+    "5j020h1a3h124f291h",
+    "62193j104g2a1g",
+    "3w02231b3i104h291g",
+    "1z01411b3i104i281g",
+    "611a3k0z4h291g",
+    "601b3l0x4i290r020n",
+    "03025v1a3n0v4j290r020n",
+    "60193o0u4m261h",
+    # 30S
+    "03015w183q0t4m261h",
+    "60183q0s4o251h",
+    "60173s0q4p250a0215",
+    "60163t0p4q240b0215",
+    "60153v0n4r0r07161i",
+    "60143v0n4t0l0e141i",
+    "60143v0m4s0k0j101k",
+    "5i0102020d133x0j4u0k0j0z1l",
+    "5z133y0g4x0d01050m0x15030d",
+    "5z12410459080u0x17030c",
+    "5y0w02039h050y0v18040a",
+    "5y0waq0t190509",
+    "5x0yaq03020n1a0508",
+    "5w0zaw0m1b0507",
+    "5w0z2f028f0m1b05010303",
+    "5w0y7g023f0m1c0902",
+    "5v0zay0g1h0803",
+    "5w0w7i023l0a1h0903",
+    "5x0qbh031g0a03",
+    "5w0pbe0204041e0805",
+    # 40S
+    "5w0p2u028i0404031b02020506",
+    "5v0qbg0301041b0a06",
+    "5v0pbh081a0a07",
+    "5v0kbm081907010208",
+    "5v0mbl0719070b",
+    "5v0mbl0717080c",
+    "5u0mbm0716080d",
+    "06035l0kbp04150b0d",
+    "06035l0kcx0a0f",
+    "5u0kcw090h",
+    "5u0kcv0a0h",
+    "5t0h6i026e0a0i",
+    "5s0i6i0201026b090j",
+    "5s0k5r020q026c0101050k",
+    "5u0j5q0176030n",
+    "5s0lcv020q",
+    "5s0lcv020q",
+    "5s0k7h0364",
+    "5s0i7j0562",
+    "5s0h7k04600102",
+    # 50S
+    "5s0hcz010r",
+    "5s0f0e01cl020r",
+    "5t0e0e08cf010r",
+    "5t0e0e08d7",
+)
+
+
+def _decode_mask(rows):
+    """Expand the run-length rows into one bytes object per row (1 = land)"""
+    decoded = []
+    for row in rows:
+        cells = bytearray()
+        land = 0
+        for i in range(0, len(row), 2):
+            cells.extend(bytes([land]) * int(row[i:i + 2], 36))
+            land ^= 1
+        decoded.append(bytes(cells))
+    return decoded
+
+
+OCEAN_MASK = _decode_mask(OCEAN_MASK_RLE)
+
+
+def is_open_ocean(lat, lng):
+    """
+    Offline check whether a point lies in a cell with no land near it
+
+    Returns:
+        True only when the point is certainly over open water
+    """
+    row = int((OCEAN_MASK_NORTH - lat) // OCEAN_MASK_CELL)
+    if row < 0 or row >= len(OCEAN_MASK):
+        return False
+    col = int(((lng + 180.0) % 360.0) // OCEAN_MASK_CELL)
+    return OCEAN_MASK[row][col] == 0
+
+
+# ============================================================
+# CACHE
+# ============================================================
+def quantize(lat, lng, cell_deg):
+    """Map a point to the integer (row, col) of its grid cell"""
+    return math.floor(lat / cell_deg), math.floor(((lng + 180.0) % 360.0) / cell_deg)
+
+
+class ReverseGeocodeCache:
+    """Two-tier (memory LRU + SQLite) cache keyed by quantized position"""
+
+    def __init__(self, path=None, ttl=30 * 86400, maxsize=4096, cell_deg=0.2, clock=time.time):
+        """
+        Args:
+            path: SQLite file for the persistent tier (None keeps memory only)
+            ttl: Seconds an entry stays valid in either tier
+            maxsize: Entries kept in the in-memory LRU
+            cell_deg: Grid cell size in degrees (0.2 deg is roughly 22 km)
+            clock: Time source (injectable for tests)
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.cell_deg = cell_deg
+        self.clock = clock
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " cell TEXT PRIMARY KEY, hits TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _key(self, lat, lng):
+        row, col = quantize(lat, lng, self.cell_deg)
+        return f"{self.cell_deg}:{row}:{col}"
+
+    def get(self, lat, lng):
+        """
+        Returns:
+            Cached list of hits for the cell, or None on a miss/expired entry
+        """
+        key = self._key(lat, lng)
+        now = self.clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                hits, stored_at = entry
+                if now - stored_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    return hits
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT hits, stored_at FROM geocode WHERE cell = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.ttl:
+                self._db.execute("DELETE FROM geocode WHERE cell = ?", (key,))
+                self._db.commit()
+                return None
+            hits = json.loads(row[0])
+            self._remember(key, hits, row[1])
+            return hits
+
+    def put(self, lat, lng, hits):
+        key = self._key(lat, lng)
+        now = self.clock()
+        with self._lock:
+            self._remember(key, hits, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO geocode (cell, hits, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(hits), now),
+                )
+                self._db.commit()
+
+    def _remember(self, key, hits, stored_at):
+        self._memory[key] = (hits, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class CachedReverseGeocoder:
+    """Ocean pre-check, then cache, then the real reverse-geocode call"""
+
+    def __init__(self, fetch, cache=None):
+        """
+        Args:
+            fetch: Callable (lat, lng) -> list of Graphhopper hits
+            cache: ReverseGeocodeCache (defaults to memory-only)
+        """
+        self.fetch = fetch
+        self.cache = cache if cache is not None else ReverseGeocodeCache()
+        self.stats = {'ocean': 0, 'hit': 0, 'miss': 0}
+        self._lock = threading.Lock()
+
+    def lookup(self, lat, lng):
+        """
+        Returns:
+            Tuple of (list of hits, empty over water, like Graphhopper's
+            "hits" field; source), source being how it was served:
+            "ocean", "hit" or "miss" (also counted in stats)
+        """
+        lat, lng = float(lat), float(lng)
+        if is_open_ocean(lat, lng):
+            return [], self._count('ocean')
+        hits = self.cache.get(lat, lng)
+        if hits is not None:
+            return hits, self._count('hit')
+        source = self._count('miss')
+        hits = self.fetch(lat, lng)
+        self.cache.put(lat, lng, hits)
+        return hits, source
+
+    def _count(self, source):
+        with self._lock:
+            self.stats[source] += 1
+        return source
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the Webex ISS bot
+- One requests.Session, so each host (Webex, Open Notify, Graphhopper)
+  keeps a pool of keep-alive connections instead of a new TCP/TLS
+  handshake per call
+- Connect/read timeouts on every request
+- Honors 429 Retry-After and retries transient failures with bounded,
+  jittered exponential backoff; a Retry-After longer than the backoff
+  cap is returned to the caller as the 429 instead of being cut short
+- Remembers the latest rate-limit headers per host, so pollers can slow
+  down before the API starts answering 429
+"""
+
+import random
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Methods that are safe to repeat after a timeout or 5xx; anything else
+# (e.g. POSTing a Webex message) is only retried when the server tells
+# us it did not process the request (429)
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([500, 502, 503, 504])
+
+
+def parse_retry_after(value, now=None):
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date)
+
+    Returns:
+        Seconds to wait, or None if the header is missing/unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+def _header_number(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class ApiClient:
+    """Pooled HTTP client with timeouts and retry/backoff"""
+
+    def __init__(self, timeout=(3.05, 10), max_retries=4, backoff_base=0.5, backoff_max=30.0,
+                 pool_maxsize=10, sleep=time.sleep, session=None):
+        """
+        Args:
+            timeout: (connect, read) timeout in seconds applied to every call
+            max_retries: Retries after the first attempt
+            backoff_base: First backoff delay in seconds; doubles each retry
+            backoff_max: Upper bound for any single wait; a 429 asking for a
+                         longer Retry-After is returned without retrying
+            pool_maxsize: Keep-alive connections kept per host
+            sleep: Sleep function (injectable for tests/benchmarks)
+            session: Transport with a requests.Session-compatible request()
+                     method (e.g. replay_bench.ReplayTransport); defaults
+                     to a pooled requests.Session
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self.retries = 0
+        # Callables (method, url, status, retries, seconds) run after every
+        # request, e.g. bot_tracing.observe_http
+        self.observers = []
+        self._rate_limits = {}
+        self._rate_lock = threading.Lock()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+
+    def backoff(self, attempt):
+        """Jittered exponential delay for the given retry number (0-based)"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def request(self, method, url, max_retries=None, **kwargs):
+        """
+        Send a request, retrying on 429, 5xx and network errors
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            max_retries: Retries for this call (defaults to the client's);
+                         0 for callers that have their own fallback
+            **kwargs: Passed through to requests.Session.request
+
+        Returns:
+            The final requests.Response (callers still check status_code;
+            a 429 whose Retry-After exceeds backoff_max comes back as is,
+            and its wait is available from rate_limit())
+
+        Raises:
+            requests.RequestException: If the last attempt failed at the network level
+        """
+        method = method.upper()
+        if max_retries is None:
+            max_retries = self.max_retries
+        kwargs.setdefault('timeout', self.timeout)
+        idempotent = method in IDEMPOTENT_METHODS
+        start = time.perf_counter()
+        status = None
+        attempt = 0
+
+        try:
+            for attempt in range(max_retries + 1):
+                last = attempt == max_retries
+                try:
+                    r = self.session.request(method, url, **kwargs)
+                    status = r.status_code
+                    self._note_rate_limit(url, r)
+                except (requests.ConnectionError, requests.Timeout):
+                    status = None
+                    if last or not idempotent:
+                        raise
+                    self.retries += 1
+                    self.sleep(self.backoff(attempt))
+                    continue
+
+                if r.status_code == 429 and not last:
+                    wait = parse_retry_after(r.headers.get('Retry-After'))
+                    if wait is not None and wait > self.backoff_max:
+                        # Retrying sooner than asked would only earn another 429
+                        return r
+                    self.retries += 1
+                    self.sleep(wait if wait is not None else self.backoff(attempt))
+                    continue
+                if r.status_code in RETRY_STATUSES and idempotent and not last:
+                    self.retries += 1
+                    self.sleep(self.backoff(attempt))
+                    continue
+                return r
+        finally:
+            for observer in self.observers:
+                observer(method, url, status, attempt, time.perf_counter() - start)
+
+    def _note_rate_limit(self, url, r):
+        headers = r.headers
+        info = {
+            'at': time.monotonic(),
+            'retry_after': parse_retry_after(headers.get('Retry-After')) if r.status_code == 429 else None,
+            'remaining': _header_number(headers, 'X-RateLimit-Remaining', 'RateLimit-Remaining'),
+            'reset': _header_number(headers, 'X-RateLimit-Reset', 'RateLimit-Reset'),
+        }
+        # Some APIs send the reset as an epoch timestamp rather than a delta
+        if info['reset'] is not None and info['reset'] > 1e9:
+            info['reset'] = max(0.0, info['reset'] - time.time())
+        with self._rate_lock:
+            self._rate_limits[urllib.parse.urlsplit(url).netloc] = info
+
+    def rate_limit(self, url):
+        """
+        Rate-limit state from the last response of url's host
+
+        Returns:
+            Dict with "at" (monotonic time), "retry_after", "remaining" and
+            "reset" (seconds, None when the header was absent), or None if
+            the host has not been called yet
+        """
+        with self._rate_lock:
+            return self._rate_limits.get(urllib.parse.urlsplit(url).netloc)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+
+
+def get_client():
+    """Process-wide ApiClient shared by the bot and its helpers"""
+    global _default_client
+    if _default_client is None:
+        _default_client = ApiClient()
+    return _default_client
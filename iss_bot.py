@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+ISS flyover bot pipeline
+Webex message -> ISS position (Open Notify) -> reverse geocode
+(Graphhopper) -> formatted reply -> Webex post
+"""
+
+import json
+import time
+import urllib.parse
+from collections import deque
+
+from bot_tracing import Tracer, observe_http
+from geocode_cache import CachedReverseGeocoder
+from http_client import get_client
+from iss_orbit import IssPositionProvider
+
+WEBEX_API = "https://webexapis.com/v1"
+ISS_NOW_URL = "http://api.open-notify.org/iss-now.json"
+GRAPHHOPPER_GEOCODE_URL = "https://graphhopper.com/api/1/geocode?"
+# The local propagator already covers for Open Notify, so a fix that is
+# not there quickly is not worth waiting or retrying for
+ISS_TIMEOUT = (1.5, 3)
+
+# For the sake of testing, the max number of seconds is set to 5.
+MAX_DELAY_SECONDS = 5
+
+
+def parse_command(message):
+    """
+    Parse a "/seconds" command
+
+    Args:
+        message: Message text
+
+    Returns:
+        Delay in seconds (capped at MAX_DELAY_SECONDS), or None if the
+        message is not a command
+
+    Raises:
+        ValueError: If the message starts with "/" but is not a number
+    """
+    if message.find("/") != 0:
+        return None
+    if not message[1:].isdigit():
+        raise ValueError("Incorrect user input.")
+    return min(int(message[1:]), MAX_DELAY_SECONDS)
+
+
+def format_response(timestamp, lat, lng, hits):
+    """
+    Build the reply text from an ISS fix and Graphhopper hits
+
+    Example: On Tue Mar 12 00:16:04 2024 (GMT), the ISS was flying over Mobert Creek, Canada. (47.4917°, -37.3643°)
+    """
+    # Use the time.ctime function to convert the timestamp to a human readable date and time.
+    timeString = time.ctime(timestamp)
+
+    if len(hits) == 0:
+        return "On {} (GMT), the ISS was flying over a body of water or unpopulated area at latitude {}° and longitude {}°.".format(timeString, lat, lng)
+
+    hit = hits[0]
+    if "street" in hit and "city" in hit:
+        return "On {} (GMT), the ISS was flying over {} in {}, {}. ({}°, {}°)".format(timeString, hit["street"], hit["city"], hit["country"], lat, lng)
+    elif "city" in hit:
+        return "On {} (GMT), the ISS was flying over {}, {}. ({}°, {}°)".format(timeString, hit["city"], hit["country"], lat, lng)
+    elif "name" in hit:
+        return "On {} (GMT), the ISS was flying over {} in {}. ({}°, {}°)".format(timeString, hit["name"], hit["country"], lat, lng)
+    else:
+        return "On {} (GMT), the ISS was flying over {}. ({}°, {}°)".format(timeString, hit["country"], lat, lng)
+
+
+class MessageCursor:
+    """How far one room has been read, plus the IDs already handled"""
+
+    def __init__(self, remember=1000):
+        """
+        Args:
+            remember: Number of handled message IDs kept for de-duplication
+        """
+        self.last_id = None
+        self.last_created = None
+        self.primed = False
+        self._seen = set()
+        self._order = deque()
+        self._remember = remember
+
+    def mark_seen(self, message):
+        """
+        Record a message as handled
+
+        Returns:
+            True the first time a message ID is seen, False for duplicates
+        """
+        message_id = message["id"]
+        if message_id in self._seen:
+            return False
+        self._seen.add(message_id)
+        self._order.append(message_id)
+        if len(self._order) > self._remember:
+            self._seen.discard(self._order.popleft())
+        return True
+
+    def advance(self, message):
+        """Move the read position forward to message (never backwards)"""
+        created = message.get("created", "")
+        if self.last_created is None or created >= self.last_created:
+            self.last_id = message["id"]
+            self.last_created = created
+
+    def reached(self, message):
+        """True if message is at or before the read position"""
+        if self.last_id is None:
+            return False
+        return message["id"] == self.last_id or message.get("created", "") < self.last_created
+
+
+class IssBot:
+    """The API calls the bot makes, bound to one token/key and HTTP client"""
+
+    def __init__(self, access_token, graphhopper_key, api_base=WEBEX_API, client=None, geocode_cache=None,
+                 tracer=None):
+        """
+        Args:
+            access_token: Webex "Authorization" header value ("Bearer ...")
+            graphhopper_key: Graphhopper API key
+            api_base: Webex API base URL
+            client: http_client.ApiClient (defaults to the shared one)
+            geocode_cache: geocode_cache.ReverseGeocodeCache (defaults to memory-only)
+            tracer: bot_tracing.Tracer timing the poll/iss/geocode/post stages
+        """
+        self.access_token = access_token
+        self.graphhopper_key = graphhopper_key
+        self.api_base = api_base
+        self.client = client if client is not None else get_client()
+        self.geocoder = CachedReverseGeocoder(self.reverse_geocode, geocode_cache)
+        # Positions are propagated locally; Open Notify is only asked for a
+        # fresh fix when the predicted error grows past the threshold
+        self.iss = IssPositionProvider(self.fetch_iss_position)
+        self.tracer = tracer if tracer is not None else Tracer()
+        # Room ID -> span of its latest poll, so commands can link to it
+        self.last_poll = {}
+        # Bots may share a client (get_client()); hook it up only once
+        if observe_http not in self.client.observers:
+            self.client.observers.append(observe_http)
+
+    def _check(self, r, service="Webex"):
+        if not r.status_code == 200:
+            raise Exception("Incorrect reply from {} API. Status code: {}. Text: {}".format(service, r.status_code, r.text))
+
+    def list_messages(self, room_id, max_items, before_message=None):
+        """
+        Returns:
+            Up to max_items messages, newest first
+        """
+        params = {"roomId": room_id, "max": max_items}
+        if before_message is not None:
+            params["beforeMessage"] = before_message
+        r = self.client.get(self.api_base + "/messages",
+                            params=params,
+                            headers={"Authorization": self.access_token})
+        self._check(r)
+        return r.json()["items"]
+
+    def new_messages(self, room_id, cursor, page_size=50, max_pages=10):
+        """
+        Fetch every message posted since the cursor, in one call when possible
+
+        The first call only primes the cursor at the newest message, so
+        history is not replayed when the bot starts. Afterwards, pages of
+        page_size are read newest-first until the cursor position is
+        reached, following beforeMessage for bursts larger than a page.
+
+        Returns:
+            New messages, oldest first (the poll's span is kept in last_poll)
+        """
+        with self.tracer.span('poll', room=room_id) as span:
+            messages = self._new_messages(room_id, cursor, page_size, max_pages)
+            span.set(messages=len(messages))
+        self.last_poll[room_id] = span
+        return messages
+
+    def _new_messages(self, room_id, cursor, page_size, max_pages):
+        if not cursor.primed:
+            items = self.list_messages(room_id, 1)
+            if items:
+                cursor.mark_seen(items[0])
+                cursor.advance(items[0])
+            cursor.primed = True
+            return []
+
+        collected = []
+        before = None
+        for _ in range(max_pages):
+            items = self.list_messages(room_id, page_size, before)
+            reached = False
+            for message in items:
+                if cursor.reached(message):
+                    reached = True
+                    break
+                collected.append(message)
+            if reached or len(items) < page_size:
+                break
+            before = items[-1]["id"]
+
+        collected.reverse()
+        if collected:
+            cursor.advance(collected[-1])
+        return collected
+
+    def fetch_message(self, message_id):
+        """Fetch one message by ID (webhook payloads only carry the ID)"""
+        r = self.client.get(self.api_base + "/messages/" + message_id,
+                            headers={"Authorization": self.access_token})
+        self._check(r)
+        return r.json()
+
+    def fetch_iss_position(self):
+        """
+        Ask Open Notify for the current position (uncached, one short attempt)
+
+        Returns:
+            Tuple of (latitude, longitude, epoch timestamp); lat/lng are
+            the strings Open Notify returns
+        """
+        r = self.client.get(ISS_NOW_URL, timeout=ISS_TIMEOUT, max_retries=0)
+        json_data = r.json()
+        if not json_data.get("message") == "success":
+            raise Exception("Incorrect reply from Open Notify API. Status code: {}".format(r.status_code))
+        return (json_data["iss_position"]["latitude"],
+                json_data["iss_position"]["longitude"],
+                json_data["timestamp"])
+
+    def reverse_geocode(self, lat, lng):
+        """Uncached Graphhopper reverse geocode; returns the "hits" list"""
+        loc = "&point=" + str(lat) + "," + str(lng)
+        url = GRAPHHOPPER_GEOCODE_URL + urllib.parse.urlencode({"key": self.graphhopper_key, "reverse": "true"}) + loc
+        r = self.client.get(url)
+        json_data = r.json()
+        if not r.status_code == 200:
+            raise Exception("Graphhopper Error message: " + json_data["message"])
+        return json_data["hits"]
+
+    def post_message(self, room_id, text):
+        with self.tracer.span('post', room=room_id):
+            r = self.client.post(self.api_base + "/messages",
+                                 data=json.dumps({"roomId": room_id, "text": text}),
+                                 headers={"Authorization": self.access_token, "Content-Type": "application/json"})
+            self._check(r)
+            return r.json()
+
+    def lookup_flyover(self):
+        """
+        Run the ISS lookup and reverse geocode
+
+        Returns:
+            Reply text describing where the ISS is now
+        """
+        with self.tracer.span('iss') as span:
+            lat, lng, timestamp, source = self.iss.position()
+            span.set(source=source)
+        with self.tracer.span('geocode') as span:
+            hits, source = self.geocoder.lookup(lat, lng)
+            span.set(source=source)
+        return format_response(timestamp, lat, lng, hits)
+
+    def respond(self, room_id, seconds, sleep=time.sleep):
+        """
+        Blocking pipeline for one command: wait, look up, post
+
+        Returns:
+            The text posted to the room
+        """
+        sleep(seconds)
+        text = self.lookup_flyover()
+        self.post_message(room_id, text)
+        return text
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Local ISS position propagation
+Two Open Notify fixes define the orbital plane and angular rate in a
+frame that turns with the orbit's node (Earth rotation minus the J2
+nodal regression); the current sub-satellite point is that circular
+orbit rotated forward in time, mapped back to the rotating Earth.
+The API is only called again when the estimated error of the
+prediction exceeds a threshold, or when the model cannot be built yet;
+after a failed call it is left alone for an exponentially growing
+pause, during which the (stale) prediction is served.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+EARTH_RADIUS_KM = 6371.0
+EARTH_EQUATORIAL_RADIUS_KM = 6378.137
+EARTH_MU_KM3_S2 = 398600.4418
+EARTH_J2 = 1.08263e-3
+# Sidereal rotation rate of the Earth
+EARTH_ROTATION_RAD_S = 7.2921159e-5
+ISS_SPEED_KM_S = 7.66
+# Open Notify timestamps are whole seconds, so one fix can be off by up
+# to half a second of travel along the ground track
+FIX_ERROR_KM = ISS_SPEED_KM_S * 0.5
+# A circular model ignores eccentricity: the true angular rate swings
+# by +/-2e around the mean, so the along-track error can grow by up to
+# 2 * e * v per second ahead (ISS e stays below ~0.001)
+ECCENTRICITY_DRIFT_KM_S = 2 * 0.001 * ISS_SPEED_KM_S
+# Margin applied to the drift rate measured at re-syncs
+DRIFT_SAFETY = 1.5
+
+
+def _to_inertial(t, lat, lng, spin):
+    """Unit vector of a sub-satellite point in a frame turning at -spin relative to the Earth"""
+    phi = math.radians(lat)
+    lam = math.radians(lng) + spin * t
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def _from_inertial(t, v, spin):
+    x, y, z = v
+    lat = math.degrees(math.atan2(z, math.hypot(x, y)))
+    lng = math.degrees(math.atan2(y, x) - spin * t)
+    lng = (lng + 180.0) % 360.0 - 180.0
+    return lat, lng
+
+
+def _cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def great_circle_km(lat1, lng1, lat2, lng2):
+    """Haversine distance between two points"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def nodal_regression_rate(rate, cos_inclination):
+    """J2 secular drift of the ascending node (rad/s) for a circular orbit"""
+    a = (EARTH_MU_KM3_S2 / (rate * rate)) ** (1.0 / 3.0)
+    return -1.5 * rate * EARTH_J2 * (EARTH_EQUATORIAL_RADIUS_KM / a) ** 2 * cos_inclination
+
+
+class CircularOrbit:
+    """Circular orbit through two fixes, with J2 nodal regression"""
+
+    def __init__(self, fix1, fix2):
+        """
+        Args:
+            fix1, fix2: (epoch seconds, latitude, longitude), fix1 older
+        """
+        if fix2[0] <= fix1[0]:
+            raise ValueError("Fixes do not define an orbit")
+        # Fit once in an inertial frame to get inclination and mean motion,
+        # then refit in the frame that follows the regressing node
+        self._fit(fix1, fix2, EARTH_ROTATION_RAD_S)
+        self.node_rate = nodal_regression_rate(self.rate, self.normal[2])
+        self._fit(fix1, fix2, EARTH_ROTATION_RAD_S - self.node_rate)
+        self.baseline = fix2[0] - fix1[0]
+
+    def _fit(self, fix1, fix2, spin):
+        t1, lat1, lng1 = fix1
+        t2, lat2, lng2 = fix2
+        r1 = _to_inertial(t1, lat1, lng1, spin)
+        r2 = _to_inertial(t2, lat2, lng2, spin)
+        n = _cross(r1, r2)
+        sin_angle = math.sqrt(_dot(n, n))
+        if sin_angle == 0:
+            raise ValueError("Fixes do not define an orbit")
+        self.spin = spin
+        self.normal = (n[0] / sin_angle, n[1] / sin_angle, n[2] / sin_angle)
+        self.rate = math.atan2(sin_angle, _dot(r1, r2)) / (t2 - t1)
+        self.epoch = t2
+        self.origin = r2
+
+    def position(self, t):
+        """
+        Returns:
+            (latitude, longitude) of the sub-satellite point at epoch t
+        """
+        # Rodrigues rotation of origin about the orbit normal
+        angle = self.rate * (t - self.epoch)
+        c, s = math.cos(angle), math.sin(angle)
+        k, v = self.normal, self.origin
+        kxv = _cross(k, v)
+        kdv = _dot(k, v)
+        rotated = tuple(v[i] * c + kxv[i] * s + k[i] * kdv * (1 - c) for i in range(3))
+        return _from_inertial(t, rotated, self.spin)
+
+
+class IssPositionProvider:
+    """ISS position from a local propagator, re-synced from the API on demand"""
+
+    def __init__(self, fetch, threshold_km=10.0, min_baseline=60, max_baseline=2400, retry_base=5.0,
+                 retry_max=300.0, clock=time.time):
+        """
+        Args:
+            fetch: Callable returning (latitude, longitude, timestamp) from the API
+            threshold_km: Re-sync when the estimated prediction error exceeds this
+            min_baseline: Seconds between two fixes before they are trusted
+            max_baseline: Oldest fix (seconds before the newest) used to fit the orbit;
+                          kept below half an orbit (~46 minutes) so the angle is unambiguous
+            retry_base: Seconds the API is left alone after a failed fetch;
+                        doubles with every further failure
+            retry_max: Upper bound for that pause
+            clock: Time source (injectable for tests/benchmarks)
+        """
+        self.fetch = fetch
+        self.threshold_km = threshold_km
+        self.min_baseline = min_baseline
+        self.max_baseline = max_baseline
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.clock = clock
+        self.fixes = deque(maxlen=64)
+        self.orbit = None
+        self.drift_samples = deque(maxlen=8)
+        self.stats = {'api': 0, 'predicted': 0, 'stale': 0}
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def predicted_error_km(self, t):
+        """
+        Estimated error of the local prediction at epoch t
+
+        Timestamp quantisation of the two fixes (which also skews the
+        fitted rate) plus the eccentricity bound, or the worst drift
+        measured at recent re-syncs if that is larger.
+        """
+        if self.orbit is None:
+            return math.inf
+        ahead = abs(t - self.orbit.epoch)
+        model = FIX_ERROR_KM * (1 + 2 * ahead / self.orbit.baseline) + ECCENTRICITY_DRIFT_KM_S * ahead
+        drift = DRIFT_SAFETY * max(self.drift_samples, default=0.0) * ahead
+        return max(model, drift)
+
+    def add_fix(self, t, lat, lng):
+        """Record an API fix, calibrate drift against the old model and refit"""
+        with self._lock:
+            if self.orbit is not None and t > self.orbit.epoch:
+                predicted = self.orbit.position(t)
+                error = great_circle_km(predicted[0], predicted[1], lat, lng)
+                self.drift_samples.append(max(0.0, error - FIX_ERROR_KM) / (t - self.orbit.epoch))
+
+            if self.fixes and t <= self.fixes[-1][0]:
+                return
+            self.fixes.append((t, lat, lng))
+            while self.fixes and t - self.fixes[0][0] > self.max_baseline:
+                self.fixes.popleft()
+            oldest = self.fixes[0]
+            if t - oldest[0] >= self.min_baseline:
+                try:
+                    self.orbit = CircularOrbit(oldest, (t, lat, lng))
+                except ValueError:
+                    pass
+
+    def predict(self, t):
+        if self.orbit is None:
+            return None
+        return self.orbit.position(t)
+
+    def position(self):
+        """
+        Current ISS position, in the same shape as an Open Notify reply,
+        plus how it was served
+
+        Returns:
+            Tuple of (latitude string, longitude string, epoch timestamp,
+            source), source being how it was served: "api", "predicted"
+            or "stale" (also counted in stats)
+        """
+        now = self.clock()
+        if self.predicted_error_km(now) <= self.threshold_km:
+            return self._format(now, self.predict(now), self._count('predicted'))
+        if self.orbit is not None and now < self._retry_at:
+            # Still backing off from a failed fetch
+            return self._format(now, self.predict(now), self._count('stale'))
+
+        try:
+            lat, lng, timestamp = self.fetch()
+        except Exception:
+            with self._lock:
+                self._retry_at = now + min(self.retry_max, self.retry_base * 2 ** self._failures)
+                self._failures += 1
+            if self.orbit is None:
+                raise
+            # API slow or down: a prediction beyond the threshold still
+            # beats no answer
+            return self._format(now, self.predict(now), self._count('stale'))
+
+        self._failures = 0
+        self.add_fix(timestamp, float(lat), float(lng))
+        return lat, lng, timestamp, self._count('api')
+
+    def _count(self, source):
+        with self._lock:
+            self.stats[source] += 1
+        return source
+
+    @staticmethod
+    def _format(t, point, source):
+        return "{:.4f}".format(point[0]), "{:.4f}".format(point[1]), int(t), source
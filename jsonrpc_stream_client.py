@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Client for the persistent JSON-RPC stream transport (port 5003)
+Keeps one TCP connection open, pipelines calls and matches replies by "id"
+"""
+
+import argparse
+import asyncio
+import itertools
+import time
+
+from api_codecs import JSON_CODEC
+
+
+class JsonRpcError(Exception):
+    """Error object returned by the server"""
+
+    def __init__(self, error):
+        super().__init__(error.get('message'))
+        self.code = error.get('code')
+        self.message = error.get('message')
+
+
+class JsonRpcStreamClient:
+    """Multiplexing JSON-RPC client over newline-delimited JSON"""
+
+    def __init__(self, host='localhost', port=5003, max_in_flight=256):
+        """
+        Args:
+            host: Stream server host
+            port: Stream server port
+            max_in_flight: Cap on calls awaiting a reply; further calls wait
+        """
+        self.host = host
+        self.port = port
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._reader = None
+        self._writer = None
+        self._receiver = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._receiver = asyncio.create_task(self._receive())
+        return self
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+        if self._receiver is not None:
+            await self._receiver
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                reply = JSON_CODEC.decode(line)
+                for item in reply if isinstance(reply, list) else [reply]:
+                    future = self._pending.pop(item.get('id'), None)
+                    if future is not None and not future.done():
+                        future.set_result(item)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("JSON-RPC stream closed"))
+            self._pending.clear()
+
+    async def call(self, method, *params):
+        """
+        Invoke a remote method and wait for its result
+
+        Args:
+            method: Method name, e.g. 'add'
+            *params: Positional parameters
+
+        Returns:
+            The "result" member of the reply
+
+        Raises:
+            JsonRpcError: If the server replied with an error object
+        """
+        async with self._slots:
+            request_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            self._writer.write(JSON_CODEC.encode({
+                "jsonrpc": "2.0", "method": method, "params": list(params), "id": request_id
+            }) + b'\n')
+            await self._writer.drain()
+            reply = await future
+        if 'error' in reply:
+            raise JsonRpcError(reply['error'])
+        return reply['result']
+
+
+async def run_benchmark(host, port, calls, concurrency):
+    async with JsonRpcStreamClient(host, port, max_in_flight=concurrency) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(client.call('add', i, 1) for i in range(calls)))
+        elapsed = time.perf_counter() - start
+    assert results == [i + 1 for i in range(calls)]
+    print(f"{calls} calls on one connection in {elapsed:.3f}s")
+    print(f"  {calls / elapsed:,.0f} calls/s, {elapsed / calls * 1e6:.1f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the JSON-RPC stream transport")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5003)
+    parser.add_argument('-n', '--calls', type=int, default=20000)
+    parser.add_argument('-c', '--concurrency', type=int, default=256)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.host, args.port, args.calls, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark for the Webex ISS bot
+- ReplayTransport: drop-in for requests.Session that answers Webex,
+  Open Notify and Graphhopper calls from fixtures, with tunable
+  per-service latency
+- record_fixtures: capture real Open Notify / Graphhopper replies into
+  a fixture file
+- run_replay: drives the real pipeline (IssBot + AsyncBotEngine)
+  through the transport and reports end-to-end command latency
+  percentiles and API calls per command
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from bot_engine import AsyncBotEngine
+from bot_tracing import percentile
+from geocode_cache import is_open_ocean
+from http_client import ApiClient
+from iss_bot import GRAPHHOPPER_GEOCODE_URL, ISS_NOW_URL, WEBEX_API, IssBot
+from iss_orbit import EARTH_ROTATION_RAD_S
+
+DEFAULT_LATENCY = {'webex': 0.08, 'iss': 0.15, 'geocode': 0.25}
+
+
+# ============================================================
+# FIXTURES
+# ============================================================
+def synthetic_fixtures(epoch=1710202564, duration=7200, step=1):
+    """
+    Fixture set with no recorded data: a 51.6 degree circular ground
+    track sampled every step seconds, and a placeholder place name for
+    every land sample, so the harness runs on a fresh checkout
+
+    Returns:
+        Dict with "rooms", "iss" and "geocode" lists (see record_fixtures)
+    """
+    inclination = math.radians(51.64)
+    rate = 2 * math.pi / 5560.0
+    iss = []
+    geocode = []
+    for i in range(0, duration, step):
+        u = rate * i
+        lat = math.degrees(math.asin(math.sin(inclination) * math.sin(u)))
+        lng = math.degrees(math.atan2(math.cos(inclination) * math.sin(u), math.cos(u)) - EARTH_ROTATION_RAD_S * i)
+        lng = (lng + 180.0) % 360.0 - 180.0
+        iss.append({
+            "message": "success",
+            "timestamp": epoch + i,
+            "iss_position": {"latitude": "{:.4f}".format(lat), "longitude": "{:.4f}".format(lng)},
+        })
+        if i % 30 == 0 and not is_open_ocean(lat, lng):
+            geocode.append({"point": [round(lat, 4), round(lng, 4)],
+                            "hits": [{"name": "Replay place {}".format(i // 30), "country": "Replayland"}]})
+    rooms = [{"id": "replay-room", "title": "Replay room", "type": "group"}]
+    return {"rooms": rooms, "iss": iss, "geocode": geocode}
+
+
+def record_fixtures(path, graphhopper_key, samples=120, interval=5.0, client=None):
+    """
+    Record live Open Notify fixes and their Graphhopper reverse geocodes
+
+    Args:
+        path: Fixture file to write (JSON)
+        graphhopper_key: Graphhopper API key
+        samples: Number of ISS fixes to record
+        interval: Seconds between fixes
+        client: http_client.ApiClient (defaults to a new one)
+    """
+    client = client if client is not None else ApiClient()
+    bot = IssBot(None, graphhopper_key, client=client)
+    fixtures = {"rooms": [{"id": "replay-room", "title": "Replay room", "type": "group"}], "iss": [], "geocode": []}
+    for i in range(samples):
+        reply = client.get(ISS_NOW_URL).json()
+        fixtures["iss"].append(reply)
+        lat = float(reply["iss_position"]["latitude"])
+        lng = float(reply["iss_position"]["longitude"])
+        if not is_open_ocean(lat, lng):
+            fixtures["geocode"].append({"point": [lat, lng], "hits": bot.reverse_geocode(lat, lng)})
+        if i + 1 < samples:
+            time.sleep(interval)
+    with open(path, 'w') as f:
+        json.dump(fixtures, f, indent=1)
+
+
+# ============================================================
+# TRANSPORT
+# ============================================================
+class ReplayResponse:
+    """The subset of requests.Response the bot uses"""
+
+    def __init__(self, status_code, body, headers=None):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+        self.headers = headers or {}
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class ReplayTransport:
+    """requests.Session stand-in serving the bot's three APIs from fixtures"""
+
+    def __init__(self, fixtures, latency=None, jitter=0.0, time_scale=1.0, sleep=time.sleep):
+        """
+        Args:
+            fixtures: Dict from synthetic_fixtures() or a recorded fixture file
+            latency: Dict of service ("webex", "iss", "geocode") -> seconds per call
+            jitter: Sigma of the log-normal factor applied to each latency (0 = fixed)
+            time_scale: Fixture seconds that pass per real second; Open Notify
+                        answers with the fix recorded at that replay time
+            sleep: Sleep function used to simulate latency
+        """
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.jitter = jitter
+        self.time_scale = time_scale
+        self.sleep = sleep
+        self.rooms = fixtures["rooms"]
+        self.iss = sorted(fixtures["iss"], key=lambda fix: fix["timestamp"])
+        self._iss_times = [fix["timestamp"] for fix in self.iss]
+        self.places = fixtures["geocode"]
+        self.messages = {room["id"]: [] for room in self.rooms}
+        self.calls = Counter()
+        self.replies = []
+        self._pending = {room["id"]: deque() for room in self.rooms}
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def clock(self):
+        """Replay time on the fixture timeline, for the bot's ISS propagator"""
+        return self._iss_times[0] + (time.monotonic() - self._start) * self.time_scale
+
+    def say(self, room_id, text, delay=0):
+        """
+        Post a user message to a room, timing it until the bot replies
+
+        Args:
+            delay: Seconds the command asks the bot to wait (excluded from the latency)
+        """
+        with self._lock:
+            self.messages[room_id].append(self._message(room_id, text))
+            self._pending[room_id].append((time.perf_counter(), delay))
+
+    def _message(self, room_id, text):
+        created = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f') + 'Z'
+        return {"id": uuid.uuid4().hex, "roomId": room_id, "text": text, "created": created}
+
+    def _wait(self, service):
+        base = self.latency[service]
+        if base > 0:
+            self.sleep(base * (random.lognormvariate(0, self.jitter) if self.jitter else 1.0))
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        parts = urllib.parse.urlsplit(url)
+        if url.startswith(WEBEX_API):
+            return self._webex(method, parts.path[len(urllib.parse.urlsplit(WEBEX_API).path):], params or {}, data)
+        if url.startswith(ISS_NOW_URL):
+            return self._iss()
+        if url.startswith(GRAPHHOPPER_GEOCODE_URL.rstrip('?')):
+            return self._geocode(urllib.parse.parse_qs(parts.query))
+        return ReplayResponse(404, {"message": "No fixture for " + url})
+
+    def _webex(self, method, path, params, data):
+        self._wait('webex')
+        with self._lock:
+            if method == 'GET' and path == '/rooms':
+                self.calls['webex rooms'] += 1
+                return ReplayResponse(200, {"items": self.rooms})
+            if method == 'GET' and path == '/messages':
+                self.calls['webex poll'] += 1
+                items = self.messages.get(params.get("roomId"), [])[::-1]
+                before = params.get("beforeMessage")
+                if before is not None:
+                    ids = [m["id"] for m in items]
+                    items = items[ids.index(before) + 1:] if before in ids else []
+                return ReplayResponse(200, {"items": items[:int(params.get("max", 50))]})
+            if method == 'POST' and path == '/messages':
+                self.calls['webex post'] += 1
+                body = json.loads(data)
+                message = self._message(body["roomId"], body["text"])
+                self.messages[body["roomId"]].append(message)
+                pending = self._pending[body["roomId"]]
+                if pending:
+                    started, delay = pending.popleft()
+                    self.replies.append(time.perf_counter() - started - delay)
+                return ReplayResponse(200, message)
+        return ReplayResponse(404, {"message": "Not found"})
+
+    def _iss(self):
+        self._wait('iss')
+        with self._lock:
+            self.calls['iss'] += 1
+            index = max(0, bisect.bisect_right(self._iss_times, self.clock()) - 1)
+            return ReplayResponse(200, self.iss[index])
+
+    def _geocode(self, query):
+        self._wait('geocode')
+        with self._lock:
+            self.calls['geocode'] += 1
+            lat, lng = (float(v) for v in query["point"][0].split(','))
+            nearest = min(self.places, default=None,
+                          key=lambda p: (p["point"][0] - lat) ** 2 + (p["point"][1] - lng) ** 2)
+            if nearest is None or abs(nearest["point"][0] - lat) > 1 or abs(nearest["point"][1] - lng) > 1:
+                return ReplayResponse(200, {"hits": []})
+            return ReplayResponse(200, {"hits": nearest["hits"]})
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+async def run_replay(transport, commands=50, spacing=0.2, delay=0, poll_interval=0.1):
+    """
+    Replay commands through the real bot pipeline
+
+    Args:
+        transport: ReplayTransport the bot's ApiClient sends through
+        commands: Number of "/delay" commands posted
+        spacing: Real seconds between commands
+        delay: Seconds each command asks for
+        poll_interval: Engine poll interval right after a command
+
+    Returns:
+        The IssBot used (its position/geocode stats describe the run)
+    """
+    room_id = transport.rooms[0]["id"]
+    bot = IssBot("Bearer replay", "replay-key", WEBEX_API, client=ApiClient(session=transport))
+    bot.iss.clock = transport.clock
+    engine = AsyncBotEngine(bot, [room_id], poll_interval=poll_interval, max_poll_interval=poll_interval,
+                            log=lambda *args: None)
+    runner = asyncio.get_running_loop().create_task(engine.run())
+    try:
+        while not engine.cursors[room_id].primed:
+            await asyncio.sleep(poll_interval / 10)
+        for _ in range(commands):
+            transport.say(room_id, "/{}".format(delay), delay)
+            await asyncio.sleep(spacing)
+        deadline = time.monotonic() + delay + 30
+        while len(transport.replies) < commands and time.monotonic() < deadline:
+            await asyncio.sleep(poll_interval)
+    finally:
+        runner.cancel()
+        try:
+            await runner
+        except asyncio.CancelledError:
+            pass
+    return bot
+
+
+def report(transport, bot, commands):
+    latencies = transport.replies
+    print(f"{len(latencies)}/{commands} commands answered")
+    if latencies:
+        print("  end-to-end latency: p50 {:.1f} ms, p99 {:.1f} ms, max {:.1f} ms".format(
+            percentile(latencies, 50) * 1e3, percentile(latencies, 99) * 1e3, max(latencies) * 1e3))
+    answered = max(1, len(latencies))
+    print("  API calls per command: " + ", ".join(
+        "{} {:.2f}".format(name, count / answered) for name, count in sorted(transport.calls.items())))
+    print("  ISS positions: {}".format(bot.iss.stats))
+    print("  reverse geocodes: {}".format(bot.geocoder.stats))
+    for stage, figures in bot.tracer.summary().items():
+        print("  stage {:<8} p50 {:8.2f} ms, p99 {:8.2f} ms ({} spans)".format(
+            stage, figures["p50_ms"], figures["p99_ms"], figures["count"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded API fixtures through the ISS bot pipeline")
+    parser.add_argument('--fixtures', help="Fixture file (default: synthetic ground track)")
+    parser.add_argument('--record', metavar='PATH', help="Record live fixtures to PATH and exit")
+    parser.add_argument('--graphhopper-key', help="Key used with --record")
+    parser.add_argument('-n', '--commands', type=int, default=50)
+    parser.add_argument('--spacing', type=float, default=0.2, help="Real seconds between commands")
+    parser.add_argument('--delay', type=int, default=0, help="N in the /N commands")
+    parser.add_argument('--poll', type=float, default=0.1, help="Poll interval in seconds")
+    parser.add_argument('--webex-ms', type=float, default=DEFAULT_LATENCY['webex'] * 1e3)
+    parser.add_argument('--iss-ms', type=float, default=DEFAULT_LATENCY['iss'] * 1e3)
+    parser.add_argument('--geocode-ms', type=float, default=DEFAULT_LATENCY['geocode'] * 1e3)
+    parser.add_argument('--jitter', type=float, default=0.3, help="Log-normal sigma applied to latencies")
+    parser.add_argument('--time-scale', type=float, default=60.0, help="Fixture seconds per real second")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record, args.graphhopper_key)
+        return
+
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
+    else:
+        fixtures = synthetic_fixtures()
+    latency = {'webex': args.webex_ms / 1e3, 'iss': args.iss_ms / 1e3, 'geocode': args.geocode_ms / 1e3}
+    transport = ReplayTransport(fixtures, latency, args.jitter, args.time_scale)
+    bot = asyncio.run(run_replay(transport, args.commands, args.spacing, args.delay, args.poll))
+    report(transport, bot, args.commands)
+
+
+if __name__ == '__main__':
+    main()
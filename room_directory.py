@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Webex room directory for the ISS bot
+- Streams every page of GET /rooms by following the Link rel="next"
+  header, instead of stopping at the first page
+- Caches the room list on disk per token; later runs only fetch rooms
+  active since the cached watermark, with a periodic full refresh to
+  drop deleted rooms
+- Indexes titles (sorted list for prefix search, trigrams for
+  substring search) so lookups do not scan every room
+"""
+
+import hashlib
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from requests.utils import parse_header_links
+
+from http_client import get_client
+
+WEBEX_API = "https://webexapis.com/v1"
+
+
+def next_link(r):
+    """URL of the next page from a Link header, or None on the last page"""
+    header = r.headers.get('Link')
+    if not header:
+        return None
+    for link in parse_header_links(header):
+        if link.get('rel') == 'next':
+            return link.get('url')
+    return None
+
+
+def iter_rooms(access_token, api_base=WEBEX_API, client=None, page_size=100, sort_by=None):
+    """
+    Lazily yield every room visible to the token, one page at a time
+
+    Args:
+        access_token: Webex "Authorization" header value ("Bearer ...")
+        api_base: Webex API base URL
+        client: http_client.ApiClient (defaults to the shared one)
+        page_size: Rooms requested per page
+        sort_by: Optional Webex sortBy value ("id", "lastactivity", "created")
+
+    Raises:
+        Exception: On a non-200 reply, like the rest of the bot
+    """
+    client = client if client is not None else get_client()
+    params = {"max": page_size}
+    if sort_by is not None:
+        params["sortBy"] = sort_by
+    url = api_base + "/rooms"
+    while url is not None:
+        r = client.get(url, params=params, headers={"Authorization": access_token})
+        if not r.status_code == 200:
+            raise Exception("Incorrect reply from Webex API. Status code: {}. Text: {}".format(r.status_code, r.text))
+        for room in r.json()["items"]:
+            yield room
+        # The next link already carries max/sortBy and the page cursor
+        url = next_link(r)
+        params = None
+
+
+class TitleIndex:
+    """Prefix and substring lookup over room titles"""
+
+    def __init__(self, rooms):
+        """
+        Args:
+            rooms: Rooms in display order; results keep this order
+        """
+        self.rooms = list(rooms)
+        self._lower = [room.get("title", "").lower() for room in self.rooms]
+        self._sorted = sorted((title, i) for i, title in enumerate(self._lower))
+        self._trigrams = defaultdict(set)
+        for i, title in enumerate(self._lower):
+            for j in range(len(title) - 2):
+                self._trigrams[title[j:j + 3]].add(i)
+
+    def _candidates(self, needle):
+        if len(needle) < 3:
+            return range(len(self.rooms))
+        sets = [self._trigrams.get(needle[j:j + 3]) for j in range(len(needle) - 2)]
+        if not all(sets):
+            return ()
+        sets.sort(key=len)
+        return sorted(set.intersection(*sets))
+
+    def search(self, text, case_sensitive=True):
+        """
+        Rooms whose title contains text (same semantics as title.find(text) != -1)
+
+        Returns:
+            Matching rooms in display order
+        """
+        needle = text.lower()
+        matches = []
+        for i in self._candidates(needle):
+            title = self.rooms[i].get("title", "") if case_sensitive else self._lower[i]
+            if (text if case_sensitive else needle) in title:
+                matches.append(self.rooms[i])
+        return matches
+
+    def prefix(self, text):
+        """
+        Rooms whose title starts with text (case-insensitive)
+
+        Returns:
+            Matching rooms in display order
+        """
+        needle = text.lower()
+        start = bisect_left(self._sorted, (needle, -1))
+        hits = []
+        for title, i in self._sorted[start:]:
+            if not title.startswith(needle):
+                break
+            hits.append(i)
+        return [self.rooms[i] for i in sorted(hits)]
+
+
+class RoomDirectory:
+    """All rooms of one token, cached on disk and indexed by title"""
+
+    def __init__(self, access_token, api_base=WEBEX_API, client=None, cache_dir=None,
+                 max_age=300, full_refresh_age=86400, clock=time.time):
+        """
+        Args:
+            access_token: Webex "Authorization" header value ("Bearer ...")
+            api_base: Webex API base URL
+            client: http_client.ApiClient (defaults to the shared one)
+            cache_dir: Directory for the room cache (None keeps memory only)
+            max_age: Seconds a cached list is used without asking Webex
+            full_refresh_age: Seconds after which the whole list is re-read,
+                              so rooms the user left disappear
+            clock: Time source (injectable for tests)
+        """
+        self.access_token = access_token
+        self.api_base = api_base
+        self.client = client if client is not None else get_client()
+        self.max_age = max_age
+        self.full_refresh_age = full_refresh_age
+        self.clock = clock
+        self.path = None
+        if cache_dir is not None:
+            # One file per token/API, so accounts never see each other's rooms
+            digest = hashlib.sha256((api_base + access_token).encode('utf-8')).hexdigest()[:16]
+            self.path = os.path.join(cache_dir, "rooms-{}.json".format(digest))
+        self.rooms = {}
+        self.fetched_at = 0.0
+        self.full_at = 0.0
+        self.index = TitleIndex([])
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            rooms = {room["id"]: room for room in cached["rooms"]}
+            fetched_at = float(cached["fetched_at"])
+            full_at = float(cached["full_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Unreadable or not in the expected shape: start empty, so the
+            # first refresh() re-reads every room
+            return
+        self.rooms = rooms
+        self.fetched_at = fetched_at
+        self.full_at = full_at
+        self._reindex()
+
+    def _save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"fetched_at": self.fetched_at, "full_at": self.full_at,
+                       "rooms": list(self.rooms.values())}, f)
+        os.replace(tmp, self.path)
+
+    def _reindex(self):
+        ordered = sorted(self.rooms.values(), key=lambda room: room.get("lastActivity", ""), reverse=True)
+        self.index = TitleIndex(ordered)
+
+    def refresh(self, force=False):
+        """
+        Bring the room list up to date
+
+        Uses the cache as is while it is younger than max_age. Otherwise
+        rooms are streamed most recently active first and reading stops at
+        the first one not newer than the cached watermark; a full re-read
+        happens every full_refresh_age seconds or when force is set.
+
+        Returns:
+            Number of rooms fetched from Webex
+        """
+        now = self.clock()
+        full = force or not self.rooms or now - self.full_at >= self.full_refresh_age
+        if not full and now - self.fetched_at < self.max_age:
+            return 0
+
+        fetched = 0
+        if full:
+            rooms = {}
+            for room in iter_rooms(self.access_token, self.api_base, self.client, sort_by="lastactivity"):
+                rooms[room["id"]] = room
+                fetched += 1
+            self.rooms = rooms
+            self.full_at = now
+        else:
+            watermark = max((room.get("lastActivity", "") for room in self.rooms.values()), default="")
+            for room in iter_rooms(self.access_token, self.api_base, self.client, sort_by="lastactivity"):
+                if room.get("lastActivity", "") <= watermark:
+                    break
+                self.rooms[room["id"]] = room
+                fetched += 1
+        self.fetched_at = now
+        self._reindex()
+        self._save()
+        return fetched
+
+    def __iter__(self):
+        return iter(self.index.rooms)
+
+    def __len__(self):
+        return len(self.index.rooms)
+
+    def search(self, text, case_sensitive=True):
+        return self.index.search(text, case_sensitive)
+
+    def prefix(self, text):
+        return self.index.prefix(text)
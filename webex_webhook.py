@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Webhook mode for the Webex ISS bot
+- WebhookReceiver: small local HTTP server that accepts Webex
+  "messages/created" events and queues them for the bot
+- register_webhook / delete_webhook: Webex API helpers
+- WebexStandIn: local fake Webex that stores messages, serves
+  GET /v1/messages/{id} and fires Webex-shaped webhook payloads,
+  so webhook mode can be exercised without a public URL
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import queue
+import threading
+import urllib.parse
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_client import get_client
+
+WEBEX_API = "https://webexapis.com/v1"
+
+
+# ============================================================
+# WEBHOOK RECEIVER
+# ============================================================
+def sign_payload(secret, body):
+    """Webex signs webhook bodies with HMAC-SHA1 in the X-Spark-Signature header"""
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha1).hexdigest()
+
+
+def _content_length(headers):
+    """Request body size, or None if the Content-Length header is malformed"""
+    try:
+        length = int(headers.get('Content-Length', 0))
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+class WebhookReceiver:
+    """Accepts webhook POSTs and hands message-created events to the bot"""
+
+    def __init__(self, host='0.0.0.0', port=8080, room_id=None, secret=None):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on
+            room_id: Only queue events for this room (None accepts all rooms)
+            secret: Shared secret used to verify X-Spark-Signature
+        """
+        self.room_id = room_id
+        self.secret = secret
+        self.events = queue.Queue()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def next_event(self, timeout=None):
+        """
+        Block until a message-created event arrives
+
+        Returns:
+            The webhook "data" object (has "id", "roomId", "personId", ...),
+            or None if the timeout expired
+        """
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def accept(self, body, signature=None):
+        """
+        Validate a raw webhook body and queue it if relevant
+
+        Returns:
+            HTTP status code to send back to Webex
+        """
+        if self.secret is not None:
+            expected = sign_payload(self.secret, body)
+            if not signature or not hmac.compare_digest(expected, signature):
+                return 403
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(payload, dict):
+            return 400
+        if payload.get('resource') != 'messages' or payload.get('event') != 'created':
+            return 204
+        data = payload.get('data') or {}
+        if not isinstance(data, dict):
+            return 400
+        if self.room_id is not None and data.get('roomId') != self.room_id:
+            return 204
+        self.events.put(data)
+        return 200
+
+    def _make_handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = _content_length(self.headers)
+                if length is None:
+                    self.send_response(400)
+                else:
+                    # Acknowledge immediately; the bot does the real work off the queue
+                    body = self.rfile.read(length)
+                    self.send_response(receiver.accept(body, self.headers.get('X-Spark-Signature')))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# ============================================================
+# WEBEX API HELPERS
+# ============================================================
+def register_webhook(access_token, target_url, room_id, secret=None, api_base=WEBEX_API):
+    """
+    Create a messages/created webhook for one room
+
+    Returns:
+        The webhook ID
+
+    Raises:
+        Exception: If Webex rejects the registration
+    """
+    body = {
+        "name": "ISS bot",
+        "targetUrl": target_url,
+        "resource": "messages",
+        "event": "created",
+        "filter": "roomId=" + room_id,
+    }
+    if secret is not None:
+        body["secret"] = secret
+    r = get_client().post(api_base + "/webhooks",
+                          data=json.dumps(body),
+                          headers={"Authorization": access_token, "Content-Type": "application/json"})
+    if not r.status_code == 200:
+        raise Exception("Incorrect reply from Webex API. Status code: {}. Text: {}".format(r.status_code, r.text))
+    return r.json()["id"]
+
+
+def delete_webhook(access_token, webhook_id, api_base=WEBEX_API):
+    get_client().delete(api_base + "/webhooks/" + webhook_id,
+                        headers={"Authorization": access_token})
+
+
+# ============================================================
+# LOCAL WEBEX STAND-IN
+# ============================================================
+class WebexStandIn:
+    """
+    Minimal fake of the Webex messages API plus webhook delivery
+
+    Point the bot's api_base at http://host:port/v1 and its webhook
+    receiver at target_url, then call emit("/3").
+    """
+
+    def __init__(self, target_url, room_id='standin-room', secret=None, host='localhost', port=0):
+        self.target_url = target_url
+        self.room_id = room_id
+        self.secret = secret
+        self.messages = {}
+        self.posted = []
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def api_base(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def emit(self, text, person_email='tester@example.com'):
+        """
+        Store a message and deliver its webhook like Webex would
+
+        Returns:
+            HTTP status the receiver answered with
+        """
+        created = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        message = {
+            "id": uuid.uuid4().hex,
+            "roomId": self.room_id,
+            "roomType": "group",
+            "text": text,
+            "personId": "standin-person",
+            "personEmail": person_email,
+            "created": created,
+        }
+        self.messages[message["id"]] = message
+        payload = {
+            "id": "standin-webhook",
+            "name": "ISS bot",
+            "targetUrl": self.target_url,
+            "resource": "messages",
+            "event": "created",
+            "filter": "roomId=" + self.room_id,
+            "orgId": "standin-org",
+            "createdBy": "standin-person",
+            "appId": "standin-app",
+            "ownedBy": "creator",
+            "status": "active",
+            "created": created,
+            "actorId": "standin-person",
+            "data": {key: message[key] for key in ("id", "roomId", "roomType", "personId", "personEmail", "created")},
+        }
+        body = json.dumps(payload).encode('utf-8')
+        headers = {"Content-Type": "application/json"}
+        if self.secret is not None:
+            headers["X-Spark-Signature"] = sign_payload(self.secret, body)
+        return requests.post(self.target_url, data=body, headers=headers, timeout=10).status_code
+
+    def _make_handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send_json(self, status, obj):
+                body = json.dumps(obj).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                params = dict(urllib.parse.parse_qsl(query))
+                if path.startswith('/v1/messages/'):
+                    message = standin.messages.get(path.rsplit('/', 1)[-1])
+                    if message is None:
+                        self._send_json(404, {"message": "Message not found"})
+                    else:
+                        self._send_json(200, message)
+                elif path == '/v1/rooms':
+                    self._send_json(200, {"items": [{"id": standin.room_id, "title": "Stand-in room", "type": "group"}]})
+                elif path == '/v1/messages':
+                    # Newest first, filtered and paged like Webex (roomId, max, beforeMessage)
+                    items = sorted((m for m in standin.messages.values() if m["roomId"] == params.get("roomId")),
+                                   key=lambda m: m["created"], reverse=True)
+                    before = params.get("beforeMessage")
+                    if before is not None:
+                        ids = [m["id"] for m in items]
+                        items = items[ids.index(before) + 1:] if before in ids else []
+                    try:
+                        max_items = int(params.get("max", 50))
+                    except ValueError:
+                        self._send_json(400, {"message": "max must be an integer"})
+                        return
+                    self._send_json(200, {"items": items[:max_items]})
+                else:
+                    self._send_json(404, {"message": "Not found"})
+
+            def do_POST(self):
+                length = _content_length(self.headers)
+                if length is None:
+                    self._send_json(400, {"message": "Invalid Content-Length"})
+                    return
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if self.path.split('?', 1)[0] == '/v1/messages':
+                    standin.posted.append(body)
+                    print("Stand-in received bot reply: " + body.get("text", ""))
+                    self._send_json(200, dict(body, id=uuid.uuid4().hex))
+                elif self.path.split('?', 1)[0] == '/v1/webhooks':
+                    # Deliver future events where, and signed how, the bot asked for
+                    standin.target_url = body.get("targetUrl", standin.target_url)
+                    standin.secret = body.get("secret", standin.secret)
+                    self._send_json(200, dict(body, id="standin-webhook", status="active"))
+                else:
+                    self._send_json(404, {"message": "Not found"})
+
+            def do_DELETE(self):
+                self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Webex stand-in that emits webhook events")
+    parser.add_argument('--target', default='http://localhost:8080/', help="Bot webhook receiver URL")
+    parser.add_argument('--room-id', default='standin-room')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--secret', default=None)
+    args = parser.parse_args()
+
+    standin = WebexStandIn(args.target, args.room_id, args.secret, port=args.port).start()
+    print("Webex stand-in API at " + standin.api_base)
+    print("Run the bot with WEBEX_API_URL=" + standin.api_base + " and type messages (e.g. /3) to emit them.")
+    try:
+        while True:
+            text = input("> ")
+            if text:
+                print("Receiver answered {}".format(standin.emit(text)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        standin.stop()
+
+
+if __name__ == '__main__':
+    main()